@@ -0,0 +1,108 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Runs the benchmark suite and writes the results as JSON.
+
+Usage: `python -m benchmarks [--filter NAME] [--repeats N] [--output FILE] [--baseline FILE]`
+
+With `--baseline`, the medians are compared against a previous report and the exit code
+is non-zero if any case got slower than the allowed tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.suite import CASES
+
+
+def run_case(name: str, params: Dict[str, int], repeats: int) -> Dict[str, Any]:
+    setup, _ = CASES[name]
+    gc.collect()
+    start = time.perf_counter()
+    iteration = setup(**params)
+    setup_time = time.perf_counter() - start
+
+    iteration()  # warm-up
+    timings: List[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        iteration()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "name": name,
+        "params": params,
+        "repeats": repeats,
+        "setup_ms": setup_time * 1e3,
+        "min_ms": min(timings) * 1e3,
+        "median_ms": statistics.median(timings) * 1e3,
+        "mean_ms": statistics.mean(timings) * 1e3,
+    }
+
+
+def regressions(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+                tolerance: float) -> List[str]:
+    """Returns a description of every case whose median is `tolerance` slower than before."""
+    previous = {(r["name"], json.dumps(r["params"])): r for r in baseline["results"]}
+    slower = []
+    for result in results:
+        before = previous.get((result["name"], json.dumps(result["params"])))
+        if before is None:
+            continue
+        ratio = result["median_ms"] / before["median_ms"]
+        if ratio > 1 + tolerance:
+            slower.append(f"{result['name']} {result['params']}: "
+                          f"{before['median_ms']:.3f} ms -> {result['median_ms']:.3f} ms")
+    return slower
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filter", default="", help="only run cases containing this string")
+    parser.add_argument("--repeats", type=int, default=20, help="timed iterations per case")
+    parser.add_argument("--output", default="-", help="JSON output file, '-' for stdout")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = []
+    for name, (_, all_params) in CASES.items():
+        if args.filter not in name:
+            continue
+        for params in all_params:
+            result = run_case(name, params, args.repeats)
+            print(f"{name:<24} {str(params):<34} median {result['median_ms']:10.3f} ms",
+                  file=sys.stderr)
+            results.append(result)
+
+    report = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for line in slower:
+            print("REGRESSION", line, file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Regression benchmark for long `createMemo` chains.
+
+Usage: `python -m benchmarks.deep_chain [depth ...]`
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import List, Tuple
+
+from fluid.signal import Signal, createEffect, createMemo
+
+
+def build_chain(depth: int) -> Tuple[Signal[int], Signal[int]]:
+    """Returns the head and tail of a chain of `depth` memos, each adding one."""
+    head = Signal(0)
+    tail = head
+    for _ in range(depth):
+        tail = createMemo(lambda prev=tail: prev() + 1)  # type: ignore
+    return head, tail
+
+
+def run(depth: int, repeats: int = 5) -> Tuple[float, float]:
+    """Returns the time to build the chain and the mean latency of an assign to its head."""
+    start = time.perf_counter()
+    head, tail = build_chain(depth)
+    seen: List[int] = []
+    createEffect(lambda: seen.append(tail()))  # type: ignore
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(1, repeats + 1):
+        head.assign(i)
+    assign = (time.perf_counter() - start) / repeats
+
+    assert seen[-1] == repeats + depth
+    return build, assign
+
+
+def main(depths: List[int]) -> None:
+    for depth in depths:
+        build, assign = run(depth)
+        print(f"depth={depth:>7}  build={build * 1e3:9.2f} ms  assign={assign * 1e3:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main([int(d) for d in sys.argv[1:]] or [1_000, 10_000, 100_000])
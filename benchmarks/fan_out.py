@@ -0,0 +1,50 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Benchmark for batches that fan out to many computations.
+
+`num_signals` signals are assigned in a single batch, each of the `width` effects reads two
+of them, so every effect gets scheduled twice and has to be de-duplicated by the batch.
+
+Usage: `python -m benchmarks.fan_out [width ...]`
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import List
+
+from fluid.signal import Signal, batch, createEffect
+
+
+def run(width: int, num_signals: int = 10) -> float:
+    """Returns the time it takes to flush a batch touching `width` effects."""
+    signals = [Signal(0) for _ in range(num_signals)]
+    runs: List[int] = []
+
+    for i in range(width):
+        first, second = signals[i % num_signals], signals[(i + 1) % num_signals]
+        createEffect(lambda a=first, b=second: runs.append(a() + b()))  # type: ignore
+
+    runs.clear()
+    start = time.perf_counter()
+    with batch:
+        for signal in signals:
+            signal.assign(1)
+    duration = time.perf_counter() - start
+
+    assert len(runs) == width
+    return duration
+
+
+def main(widths: List[int]) -> None:
+    for width in widths:
+        duration = run(width)
+        print(f"width={width:>7}  batch={duration * 1e3:9.2f} ms  "
+              f"per computation={duration / width * 1e6:6.2f} us")
+
+
+if __name__ == "__main__":
+    main([int(w) for w in sys.argv[1:]] or [1_000, 10_000, 50_000])
@@ -0,0 +1,57 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Memory footprint and creation throughput of `Signal`s and effects.
+
+Usage: `python -m benchmarks.memory [count]`
+"""
+
+from __future__ import annotations
+
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+
+from fluid.signal import Signal, createEffect
+
+
+def measure(create: Callable[[int], List[Any]], count: int) -> Tuple[float, float]:
+    """Returns the bytes allocated per node and the number of nodes created per second."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    nodes = create(count)
+    duration = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    # tracing slows down allocations, time creation separately
+    gc.collect()
+    start = time.perf_counter()
+    nodes = create(count)
+    duration = time.perf_counter() - start
+    del nodes
+    return size / count, count / duration
+
+
+def create_signals(count: int) -> List[Any]:
+    return [Signal(i) for i in range(count)]
+
+
+def create_effects(count: int) -> List[Any]:
+    signal = Signal(0)
+    # the effect's node is kept alive by the subscription on `signal`
+    return [signal] + [createEffect(lambda: signal()) for _ in range(count)]
+
+
+def main(count: int) -> None:
+    for name, create in [("signals", create_signals), ("effects", create_effects)]:
+        per_node, throughput = measure(create, count)
+        print(f"{count} {name:<8} {per_node:8.1f} bytes/node  {throughput:12,.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,244 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Micro-benchmarks of the reactive core, modeled on the cases of js-reactivity-benchmark.
+
+Every case builds a graph for the given parameters and returns a function running one
+iteration of the workload on it, e.g. an assignment followed by the propagation.
+"""
+
+from __future__ import annotations
+
+import itertools
+from array import array
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.deep_chain import build_chain
+from fluid.arrays import ArraySignal, createArrayMap, createArraySum
+from fluid.components import For, HtmlComponent
+from fluid.js import Element
+from fluid.signal import ManualClock, Signal, batch, createEffect, createMemo, setFrameScheduler
+
+Iteration = Callable[[], None]
+
+CASES: Dict[str, Tuple[Callable[..., Iteration], List[Dict[str, int]]]] = {}
+"""Registered cases: name mapped to the set-up function and the parameters to run it with."""
+
+
+def case(*params: Dict[str, int]) -> Callable[[Callable[..., Iteration]], Callable[..., Iteration]]:
+
+    def register(setup: Callable[..., Iteration]) -> Callable[..., Iteration]:
+        CASES[setup.__name__] = (setup, list(params))
+        return setup
+
+    return register
+
+
+def _increments(signal: Signal[int]) -> Iteration:
+    """Returns an iteration assigning a new value to `signal`."""
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        signal.assign(next(counter))
+
+    return iteration
+
+
+@case({"depth": 100}, {"depth": 1_000}, {"depth": 10_000})
+def deep_chain(depth: int) -> Iteration:
+    """A chain of `depth` memos observed by a single effect."""
+    head, tail = build_chain(depth)
+    createEffect(lambda: tail())
+    return _increments(head)
+
+
+@case({"width": 100}, {"width": 1_000}, {"width": 10_000})
+def broad_fan_out(width: int) -> Iteration:
+    """A single signal read by `width` memos, each observed by its own effect."""
+    head = Signal(0)
+    for i in range(width):
+        memo = createMemo(lambda i=i: head() + i)  # type: ignore
+        createEffect(lambda memo=memo: memo())  # type: ignore
+    return _increments(head)
+
+
+@case({"width": 10}, {"width": 100}, {"width": 1_000})
+def diamond(width: int) -> Iteration:
+    """A signal fanning out to `width` memos, joined again in a single memo."""
+    head = Signal(0)
+    branches = [createMemo(lambda i=i: head() + i) for i in range(width)]  # type: ignore
+    total = createMemo(lambda: sum(branch() for branch in branches))  # type: ignore
+    createEffect(lambda: total())
+    return _increments(head)
+
+
+@case({"width": 10}, {"width": 100}, {"width": 1_000})
+def triangle(width: int) -> Iteration:
+    """A chain of `width` memos, all of which are also read by a final memo."""
+    head = Signal(0)
+    chain: List[Signal[Any]] = []
+    for _ in range(width):
+        previous = chain[-1] if chain else head
+        chain.append(createMemo(lambda previous=previous: previous() + 1))  # type: ignore
+    total = createMemo(lambda: sum(node() for node in chain))  # type: ignore
+    createEffect(lambda: total())
+    return _increments(head)
+
+
+@case({"width": 100}, {"width": 1_000})
+def mux(width: int) -> Iteration:
+    """`width` signals combined in one memo and split out again by `width` memos."""
+    heads = [Signal(0) for _ in range(width)]
+    combined = createMemo(lambda: [head() for head in heads])
+    for i in range(width):
+        split = createMemo(lambda i=i: combined()[i])  # type: ignore
+        createEffect(lambda split=split: split())  # type: ignore
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        i = next(counter)
+        heads[i % width].assign(i)
+
+    return iteration
+
+
+@case({"depth": 100}, {"depth": 1_000})
+def avoidable_propagation(depth: int) -> Iteration:
+    """A memo whose value never changes, guarding an expensive chain that never reruns."""
+    head = Signal(0)
+    guard = createMemo(lambda: head() >= 0)  # type: ignore
+    tail = guard
+    for _ in range(depth):
+        tail = createMemo(lambda previous=tail: not previous())  # type: ignore
+    createEffect(lambda: tail())
+    return _increments(head)
+
+
+@case({"reads": 30}, {"reads": 300})
+def repeated_observers(reads: int) -> Iteration:
+    """A memo reading the same signal `reads` times."""
+    head = Signal(0)
+    total = createMemo(lambda: sum(head() for _ in range(reads)))  # type: ignore
+    createEffect(lambda: total())
+    return _increments(head)
+
+
+@case({"width": 100, "sources": 10}, {"width": 1_000, "sources": 30})
+def dynamic_dependencies(width: int, sources: int) -> Iteration:
+    """`width` effects that, depending on a toggle, read the even or odd source signals."""
+    heads = [Signal(0) for _ in range(sources)]
+    toggle = Signal(0)
+    for _ in range(width):
+        createEffect(lambda: sum(head() for head in heads[toggle() % 2::2]))  # type: ignore
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        i = next(counter)
+        toggle.assign(i)
+        heads[i % sources].assign(i)
+
+    return iteration
+
+
+@case({"count": 100}, {"count": 1_000}, {"count": 10_000})
+def batch_many_signals(count: int) -> Iteration:
+    """`count` signals, each observed by an effect, assigned together in a single batch."""
+    heads = [Signal(0) for _ in range(count)]
+    for head in heads:
+        createEffect(lambda head=head: head())  # type: ignore
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        i = next(counter)
+        with batch:
+            for head in heads:
+                head.assign(i)
+
+    return iteration
+
+
+@case({"messages": 1_000})
+def frame_coalesced_burst(messages: int) -> Iteration:
+    """A burst of `messages` assignments outside of a batch, propagated once in a frame."""
+    head = Signal(0)
+    double = createMemo(lambda: head() * 2)  # type: ignore
+    createEffect(lambda: double())
+    clock = ManualClock()
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        setFrameScheduler(clock)
+        try:
+            for _ in range(messages):
+                head.assign(next(counter))
+            clock.tick()
+        finally:
+            setFrameScheduler(None)
+
+    return iteration
+
+
+@case({"size": 10_000}, {"size": 1_000_000})
+def array_element_update(size: int) -> Iteration:
+    """An array of `size` elements, mapped and summed, of which a single element is set."""
+    values = ArraySignal(array("d", range(size)))
+    total = createArraySum(createArrayMap(values, lambda x: 2 * x, typecode="d"))
+    createEffect(lambda: total())
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        i = next(counter)
+        values.set(i % size, float(i))
+
+    return iteration
+
+
+@case({"count": 100}, {"count": 1_000})
+def creation_churn(count: int) -> Iteration:
+    """An effect disposing and re-creating `count` child effects and memos on every run."""
+    head = Signal(0)
+    trigger = Signal(0)
+
+    @createEffect
+    def _parent() -> None:
+        trigger()
+        for _ in range(count):
+            memo = createMemo(lambda: head() + 1)  # type: ignore
+            createEffect(lambda memo=memo: memo())  # type: ignore
+
+    return _increments(trigger)
+
+
+@case({"rows": 1_000}, {"rows": 10_000})
+def keyed_list_update(rows: int) -> Iteration:
+    """A `For` table of `rows` rows, each with a reactive label, updating a single label."""
+    labels = [Signal(f"row {i}") for i in range(rows)]
+    table = Signal(list(range(rows)))
+    root = Element("body")
+    HtmlComponent(
+        "table", {},
+        For(table, lambda i: HtmlComponent("tr", {"class": lambda: f"row-{i % 2}"}, labels[i])),
+    ).render(root)
+    counter = itertools.count(1)
+
+    def iteration() -> None:
+        i = next(counter)
+        labels[i % rows].assign(f"updated {i}")
+
+    return iteration
+
+
+@case({"rows": 1_000})
+def keyed_list_swap(rows: int) -> Iteration:
+    """A `For` table of `rows` rows in which two rows swap places."""
+    table = Signal(list(range(rows)))
+    root = Element("body")
+    HtmlComponent("table", {}, For(table, lambda i: HtmlComponent("tr", {}, str(i)))).render(root)
+
+    def iteration() -> None:
+        order = list(table() or [])
+        order[1], order[-2] = order[-2], order[1]
+        table.assign(order)
+
+    return iteration
@@ -0,0 +1,54 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Concurrency benchmark: independent reactive graphs updated on `threads` threads at once.
+
+Every thread builds its own chain of memos in its own runtime, which also checks that
+the threads don't observe each other's computations. Due to the GIL the throughput
+doesn't scale with the threads, the benchmark measures the overhead of running them.
+
+Usage: `python -m benchmarks.threads [threads ...]`
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from benchmarks.deep_chain import build_chain
+from fluid.signal import createEffect
+
+DEPTH = 100
+ASSIGNS = 1_000
+
+
+def _pipeline(seed: int) -> int:
+    """Builds a chain in the runtime of the current thread and assigns its head."""
+    head, tail = build_chain(DEPTH)
+    seen: List[int] = []
+    createEffect(lambda: seen.append(tail()))  # type: ignore
+    for i in range(ASSIGNS):
+        head.assign(seed + i)
+    assert seen == [DEPTH] + [seed + i + DEPTH for i in range(ASSIGNS)]
+    return len(seen)
+
+
+def run(threads: int) -> float:
+    """Returns the mean time per assignment, over all threads."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(_pipeline, [1_000_000 * (t + 1) for t in range(threads)]))
+    return (time.perf_counter() - start) / (threads * ASSIGNS)
+
+
+def main(threads: List[int]) -> None:
+    for n in threads:
+        assign = run(n)
+        print(f"threads={n:>3}  assign={assign * 1e6:9.2f} us")
+
+
+if __name__ == "__main__":
+    main([int(t) for t in sys.argv[1:]] or [1, 2, 4, 8])
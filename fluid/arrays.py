@@ -0,0 +1,311 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Arrays which record the indices of their changed elements, and memos consuming these
+changes incrementally: updating a single element of an `ArraySignal` costs O(1) in the
+maps, filters and reductions depending on it, instead of a recomputation over all elements.
+"""
+
+from __future__ import annotations
+
+import abc
+import operator
+from array import array
+from typing import Any, Callable, Dict, Generic, List, Mapping, MutableSequence, TypeVar, cast
+
+from fluid.signal import Signal, createMemo
+
+__all__ = [
+    "DeltaArray",
+    "ArraySignal",
+    "createArrayMap",
+    "createArrayFilter",
+    "createArrayReduce",
+    "createArraySum",
+]
+
+T = TypeVar("T")
+"""Type of the elements of an array"""
+
+U = TypeVar("U")
+"""Type of the elements of a mapped array"""
+
+R = TypeVar("R")
+"""Type of the result of a reduction"""
+
+Delta = Dict[int, Any]
+"""Changed elements: index mapped to the element's old value."""
+
+
+class DeltaArray(Generic[T], abc.ABC):
+    """Array whose changes are recorded, the elements are read by calling it."""
+
+    __slots__ = ("_values", "_version", "_base", "_delta")
+
+    def __init__(self, values: MutableSequence[T]):
+        self._values = values
+        self._version = 0
+        self._base = -1
+        self._delta: Delta | None = None
+
+    @abc.abstractmethod
+    def _track(self) -> None:
+        raise NotImplementedError
+
+    def __call__(self) -> MutableSequence[T]:
+        """Returns the elements, to be read but not modified, and tracks the array."""
+        self._track()
+        return self._values
+
+    @property
+    def version(self) -> int:
+        """Incremented on every change of the elements."""
+        return self._version
+
+    def changes(self, since: int) -> Delta | None:
+        """
+        Returns the elements changed after `version` was `since`, mapped to their old
+        value. `None` if these aren't known, e.g. when the array got replaced, in which
+        case consumers have to recompute from all elements.
+        """
+        if since == self._version:
+            return {}
+        if since == self._base:
+            return self._delta
+        return None
+
+    def _record(self, delta: Delta | None) -> None:
+        self._base = self._version
+        self._version += 1
+        self._delta = delta
+
+
+class ArraySignal(DeltaArray[T]):
+    """
+    Signal holding an array, e.g. an `array.array`, a NumPy array or a list, which is
+    updated element by element with `set` and `update`. Like assignments, the updates of
+    a batch are applied together when it ends.
+    """
+
+    __slots__ = ("_pending", "_replacement", "_signal", "_applied")
+
+    def __init__(self, values: MutableSequence[T]):
+        super().__init__(values)
+        self._pending: Dict[int, T] = {}
+        self._replacement: MutableSequence[T] | None = None
+        self._signal = Signal[int](0, equals=False)
+        """Notifies the subscribers, its value is the number of the latest update."""
+        self._applied = 0
+
+    def _track(self) -> None:
+        committed = self._signal()
+        if committed != self._applied:
+            self._apply(committed)
+
+    def _apply(self, committed: Any) -> None:
+        # Applies the updates, once they are committed, on the first read afterwards.
+        self._applied = committed
+        delta: Delta | None = {}
+        if self._replacement is not None:
+            self._values = self._replacement
+            self._replacement = None
+            delta = None
+
+        values = self._values
+        for index, value in self._pending.items():
+            if delta is not None and index not in delta:
+                delta[index] = values[index]
+            values[index] = value
+        self._pending.clear()
+        self._record(delta)
+
+    def _notify(self) -> None:
+        self._signal.assign(self._applied + 1)
+
+    def set(self, index: int, value: T) -> None:
+        """Sets the element at `index`, which must be non-negative."""
+        self._pending[index] = value
+        self._notify()
+
+    def update(self, values: Mapping[int, T]) -> None:
+        """Sets the elements at the (non-negative) indices of `values`."""
+        self._pending.update(values)
+        self._notify()
+
+    def assign(self, values: MutableSequence[T]) -> None:
+        """Replaces all the elements, the consumers recompute from scratch."""
+        self._replacement = values
+        self._pending.clear()
+        self._notify()
+
+
+class _DerivedArray(DeltaArray[T]):
+    """Array computed from another array by a memo."""
+
+    __slots__ = ("_memo", )
+
+    def __init__(self, values: MutableSequence[T]):
+        super().__init__(values)
+        self._memo: Signal[int] | None = None
+
+    def _track(self) -> None:
+        assert self._memo is not None
+        self._memo()
+
+
+def createArrayMap(source: DeltaArray[T],
+                   function: Callable[[T], U],
+                   typecode: str | None = None,
+                   name: str | None = None) -> DeltaArray[U]:
+    """
+    Returns an array with `function` applied to every element of `source`, a list, or an
+    `array.array` of `typecode`. Only the changed elements of `source` are mapped again.
+    """
+    mapped = _DerivedArray[U]([])
+    seen = [-1]
+
+    def _update() -> int:
+        values = source()
+        changes = source.changes(seen[0])
+        seen[0] = source.version
+        if changes is None:
+            results = map(function, values)
+            if typecode is None:
+                mapped._values = list(results)
+            else:
+                mapped._values = cast(MutableSequence[U], array(typecode, results))
+            mapped._record(None)
+        elif changes:
+            target = mapped._values
+            delta = {}
+            for index in changes:
+                delta[index] = target[index]
+                target[index] = function(values[index])
+            mapped._record(delta)
+        return mapped.version
+
+    mapped._memo = createMemo(_update, name=name or "arrayMap")
+    return mapped
+
+
+class _Counts:
+    """Fenwick tree counting the selected indices, to find their rank in O(log n)."""
+
+    __slots__ = ("_tree", )
+
+    def __init__(self, selected: List[bool]):
+        tree = [0] * (len(selected) + 1)
+        for i, is_selected in enumerate(selected, 1):
+            tree[i] += is_selected
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, index: int, count: int) -> None:
+        tree = self._tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += count
+            i += i & -i
+
+    def rank(self, index: int) -> int:
+        """Number of selected indices smaller than `index`."""
+        tree = self._tree
+        total = 0
+        i = index
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+def createArrayFilter(source: DeltaArray[T],
+                      predicate: Callable[[T], bool],
+                      name: str | None = None) -> DeltaArray[T]:
+    """
+    Returns a list of the elements of `source` for which `predicate` holds, in order.
+    Only the changed elements of `source` are tested again. Elements that stay selected are
+    updated in place, those that enter or leave the selection are inserted or removed.
+    """
+    filtered = _DerivedArray[T]([])
+    selected: List[bool] = []
+    counts = [_Counts([])]
+    seen = [-1]
+
+    def _update() -> int:
+        values = source()
+        changes = source.changes(seen[0])
+        seen[0] = source.version
+        if changes is None:
+            selected[:] = [bool(predicate(value)) for value in values]
+            counts[0] = _Counts(selected)
+            filtered._values = [value for value, keep in zip(values, selected) if keep]
+            filtered._record(None)
+            return filtered.version
+        if not changes:
+            return filtered.version
+
+        target = filtered._values
+        delta: Delta | None = {}
+        for index in changes:
+            value = values[index]
+            keep = bool(predicate(value))
+            position = counts[0].rank(index)
+            if keep and selected[index]:
+                if delta is not None and position not in delta:
+                    delta[position] = target[position]
+                target[position] = value
+                continue
+            if keep == selected[index]:
+                continue
+            # Entering or leaving the selection shifts the positions of the next elements.
+            delta = None
+            selected[index] = keep
+            counts[0].add(index, 1 if keep else -1)
+            if keep:
+                target.insert(position, value)
+            else:
+                del target[position]
+        filtered._record(delta)
+        return filtered.version
+
+    filtered._memo = createMemo(_update, name=name or "arrayFilter")
+    return filtered
+
+
+def createArrayReduce(source: DeltaArray[T],
+                      add: Callable[[R, T], R],
+                      remove: Callable[[R, T], R],
+                      initial: R,
+                      name: str | None = None) -> Signal[R]:
+    """
+    Returns a memo reducing the elements of `source` with `add`, starting from `initial`.
+    `remove` must undo `add`, e.g. subtraction for an addition: a changed element is
+    removed with its old value and added with its new one.
+    """
+    result = [initial]
+    seen = [-1]
+
+    def _update() -> R:
+        values = source()
+        changes = source.changes(seen[0])
+        seen[0] = source.version
+        if changes is None:
+            accumulator = initial
+            for value in values:
+                accumulator = add(accumulator, value)
+        else:
+            accumulator = result[0]
+            for index, old in changes.items():
+                accumulator = add(remove(accumulator, old), values[index])
+        result[0] = accumulator
+        return accumulator
+
+    return createMemo(_update, name=name or "arrayReduce")
+
+
+def createArraySum(source: DeltaArray[Any], name: str | None = None) -> Signal[Any]:
+    """Returns a memo of the sum of the elements of `source`, see `createArrayReduce`."""
+    return createArrayReduce(source, operator.add, operator.sub, 0, name=name or "arraySum")
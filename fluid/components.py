@@ -4,11 +4,39 @@
 from __future__ import annotations
 
 import abc
-from typing import Any, Callable, Mapping
+import threading
+from collections import Counter
+from html import escape
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
-from fluid.js import Console, Element, TextNode
-
-# from fluid.signal import createEffect  # noqa: ignore
+from fluid.js import Comment, Element, Node, TextNode
+from fluid.js.events import delegator
+from fluid.js.headless import VOID_ELEMENTS
+from fluid.logging import get_tracer  # type: ignore
+from fluid.signal import (
+    Computation,
+    cleanUp,
+    createEffect,
+    getOwner,
+    getRuntime,
+    mapArray,
+    runWithOwner,
+)
+from fluid.utils import longest_increasing_subsequence
 
 C = Callable[[], str]
 """
@@ -16,32 +44,229 @@ Type to represent a function which produces a string.
 Typically, the function will contain `Signal`s.
 """
 
+Attribute = Union[str, bool, None, Callable[[], Union[str, bool, None]]]
+"""
+Value of an HTML attribute, or a function producing it. `True` renders an empty value,
+e.g. `disabled=""`, while `False` and `None` leave the attribute out.
+"""
+
+T = TypeVar("T")
+"""Type of the items rendered by `For`"""
+
+_trace = get_tracer("render")
+
+EVENT_PREFIX = "pys-on"
+"""Attributes starting with this prefix, e.g. `pys-onClick`, are event handlers."""
+
+build_counts: Counter[str] = Counter()
+"""Number of times `Component.build` ran, by name of the component class."""
+
+skipped_builds: Counter[str] = Counter()
+"""Number of builds skipped by reusing a component with equal props, by class name."""
+
+_counts_lock = threading.Lock()
+"""Protects the counters, components are built in the threads of all runtimes."""
+
+
+def _count(counter: Counter[str], name: str) -> None:
+    with _counts_lock:
+        counter[name] += 1
+
 
 class UpdateableStr:
+    """
+    Text node kept up-to-date with the string produced by `f`.
+
+    `f` runs in an effect owned by the computation rendering the node, so it is disposed
+    together with its owner. The DOM is only touched when the string changes.
+    """
 
     def __init__(self, f: C):
         self.f = f
-        self._rendered = False
+        self.node: TextNode | None = None
+        self._text = ""
 
-    # @createEffect
     def render(self, parent: Element) -> None:
-        Console.log("re-render updateable str")
-        if not self._rendered:
-            self.node = TextNode(self.f())
-            parent.append_child(self.node)
-            self._rendered = True
+        createEffect(self._update, name="text")
+        assert self.node is not None
+        parent.append_child(self.node)
+
+    def stream(self) -> Iterator[str]:
+        # Delimited by markers: the browser would merge it with adjacent text otherwise.
+        yield f"<!--t-->{escape(str(self.f()), quote=False)}<!--/t-->"
+
+    def hydrate(self, cursor: Cursor) -> None:
+        cursor.claim_comment("t")
+        node = cursor.peek()
+        end = cursor.claim_comment("/t")
+        if node is not None and node.nodeType == TEXT_NODE:
+            self.node = TextNode.wrap(node)
+            self._text = node.nodeValue
         else:
-            self.node.update_text(self.f())
+            # Empty strings aren't rendered by the server.
+            self.node = TextNode("")
+            Element.wrap(end.parentNode).insert_before(self.node, Comment.wrap(end))
+        createEffect(self._update, name="text")
+
+    def _update(self) -> None:
+        text = str(self.f())
+        if self.node is None:
+            self.node = TextNode(text)
+        elif text != self._text:
+            if _trace.enabled:
+                _trace.debug("update text", text=text)
+            self.node.update_text(text)
+        self._text = text
 
 
 class Component(abc.ABC):
+    """
+    Component built from other components by `build`.
+
+    `build` runs in its own effect: when it reads signals, the component is rebuilt and
+    its element replaced when they change. Child components rendered by `build` are
+    memoized by position: on a rebuild, a child of the same type and with equal `props`
+    as the previous child at that position is reused, together with its DOM subtree,
+    instead of being built again.
+    """
 
     def build(self) -> Component | HtmlComponent:
         raise NotImplementedError()
 
-    # @createEffect
-    def render(self, parent: Element) -> Element:
-        return self.build().render(parent)
+    def props(self) -> Mapping[str, Any]:
+        """
+        Inputs of `build`, compared to decide whether the component can be reused. By
+        default its public attributes. Values are equal when they are identical or `==`,
+        so pass signals rather than lambdas to keep components reusable.
+        """
+        return {key: value for key, value in vars(self).items() if not key.startswith("_")}
+
+    def render(self, parent: Element | None = None) -> Element:
+        return self._mount(parent, None)
+
+    def _mount(self, parent: Element | None, cursor: Cursor | None) -> Element:
+        building = getRuntime().building
+        frame: _Frame | None = building[-1] if building else None
+        if frame is None or frame.effect is not getOwner():
+            return self._render(parent, cursor)
+
+        # Rendered by the `build` of another component.
+        slot = (type(self), len(frame.current))
+        props = self.props()
+        previous = frame.previous.pop(slot, None)
+        if previous is not None and _props_equal(previous.props, props):
+            _count(skipped_builds, type(self).__name__)
+            frame.current[slot] = previous
+            element = previous.component._current()
+            assert element is not None
+            if parent is not None:
+                parent.append_child(element)
+            return element
+
+        if previous is not None:
+            previous.root.cleanup()
+        root: Computation[Any] = Computation(None, name=type(self).__name__)
+        element = runWithOwner(root, lambda: self._render(parent, cursor))
+        frame.current[slot] = _Rendered(self, props, root)
+        return element
+
+    def _render(self, parent: Element | None, cursor: Cursor | None) -> Element:
+        self._parent = parent
+        self._element: Element | None = None
+        self._child: Component | None = None
+        """Component returned by `build`, if any, which places its own element."""
+        frame = _Frame()
+        if getOwner() is not None:
+            cleanUp(frame.dispose)
+        # Only the first build hydrates, later ones render new elements.
+        createEffect(lambda: self._build(frame, cursor if self._element is None else None),
+                     name=type(self).__name__)
+        element = self._current()
+        assert element is not None
+        return element
+
+    def _current(self) -> Element | None:
+        # A component built as another component has that component's element, which it
+        # replaces when rebuilding itself.
+        component = self
+        while component._child is not None:
+            component = component._child
+        return component._element
+
+    def _build(self, frame: _Frame, cursor: Cursor | None) -> None:
+        _count(build_counts, type(self).__name__)
+        if _trace.enabled:
+            _trace.debug("build component", component=type(self).__name__)
+
+        old = self._current()
+        frame.effect = getOwner()
+        frame.previous, frame.current = frame.current, {}
+        building = getRuntime().building
+        building.append(frame)
+        try:
+            built = self.build()
+            element = built.render() if cursor is None else built.hydrate(cursor)
+        finally:
+            building.pop()
+        # The component rendered, or reused, first by this build.
+        self._child = frame.current[type(built), 0].component if isinstance(built, Component) \
+            else None
+        # Children that weren't reused by this build.
+        for rendered in frame.previous.values():
+            rendered.root.cleanup()
+        frame.previous = {}
+
+        if old is None:
+            if self._parent is not None:
+                self._parent.append_child(element)
+        elif element is not old and old.parent is not None:
+            # Wherever the element got moved to since, e.g. into a new element of a
+            # parent component that reused this component.
+            parent = old.parent
+            parent.insert_before(element, old)
+            parent.remove_child(old)
+        self._element = element
+
+    def stream(self) -> Iterator[str]:
+        return self.build().stream()
+
+    def hydrate(self, cursor: Cursor) -> Element:
+        """Like `render`, but the first build claims the nodes rendered by the server."""
+        return self._mount(None, cursor)
+
+
+class _Rendered:
+    """Component rendered by the `build` of another component."""
+
+    __slots__ = ("component", "props", "root")
+
+    def __init__(self, component: Component, props: Mapping[str, Any], root: Computation[Any]):
+        self.component = component
+        self.props = props
+        self.root = root
+        """Owns the computations of the component, disposed when it isn't reused."""
+
+
+class _Frame:
+    """Components rendered by the previous and the current `build` of a component."""
+
+    __slots__ = ("effect", "previous", "current")
+
+    def __init__(self) -> None:
+        self.effect: Computation[Any] | None = None
+        self.previous: Dict[Tuple[Type[Component], int], _Rendered] = {}
+        self.current: Dict[Tuple[Type[Component], int], _Rendered] = {}
+
+    def dispose(self) -> None:
+        for rendered in self.current.values():
+            rendered.root.cleanup()
+        self.current.clear()
+
+
+def _props_equal(old: Mapping[str, Any], new: Mapping[str, Any]) -> bool:
+    if old.keys() != new.keys():
+        return False
+    return all(old[key] is value or old[key] == value for key, value in new.items())
 
 
 class HtmlComponent:
@@ -49,10 +274,12 @@ class HtmlComponent:
     Represents HTML components such as `div`, `button`, `span`, etc.
     """
 
-    def __init__(self, tag: str, attributes: Mapping[str, str | C], *children: Any):
+    def __init__(self, tag: str, attributes: Mapping[str, Attribute], *children: Any):
         """
         :param tag: indicates the beginning and end of an HTML element <tag> </tag>
-        :param attributes: properties such as 'id', 'class', 'pys-onClick', etc.
+        :param attributes: properties such as 'id', 'class', 'pys-onClick', etc. Functions
+            are bound reactively: the attribute is updated when the function's value changes.
+            `pys-on<event>` attributes are handlers, called with the event in a `batch`.
         :param children: element rendered inside the component
         """
         self._tag = tag
@@ -60,13 +287,13 @@ class HtmlComponent:
         self._attributes = attributes
 
     def render(self, parent: Element | None = None) -> Element:
-        Console.log("re-render htmlcomponent")
-
-        def _mount(el: Element) -> Element:
-            return el if parent is None else parent.append_child(el)
+        if _trace.enabled:
+            _trace.debug("render html component", tag=self._tag)
 
         self._element = Element(self._tag)
-        dom = _mount(self._element)
+        if parent is not None:
+            parent.append_child(self._element)
+        dom = self._element
 
         for child in self._children:
             if isinstance(child, (str, float)):
@@ -77,24 +304,260 @@ class HtmlComponent:
                 dom.append_child(node)
             elif callable(child):
                 UpdateableStr(child).render(dom)
-            elif isinstance(child, (HtmlComponent, Component)):
+            elif isinstance(child, (HtmlComponent, Component, For)):
                 child.render(dom)
 
         for key, value in self._attributes.items():
-            if key == "class":
-                self.set_class(value)
-            else:
-                assert isinstance(value, str)
-                self._element.set_attribute(key, value)
+            self.set_attribute(key, value)
 
         return dom
 
-    # @createEffect
-    def set_class(self, value: str | C) -> None:
-        # TODO: clean up expression. Awkwardly written to make mymy happy
-        func: C
-        if isinstance(value, str):
-            func = lambda: str(value)
-        else:
-            func = value
-        self._element.set_attribute("class", func())
+    def stream(self) -> Iterator[str]:
+        yield f"<{self._tag}{_stream_attributes(self._attributes)}>"
+
+        if self._tag in VOID_ELEMENTS:
+            return
+
+        for child in self._children:
+            if isinstance(child, (str, float)):
+                yield escape(str(child), quote=False)
+            elif isinstance(child, bool):
+                pass
+            elif callable(child):
+                yield from UpdateableStr(child).stream()
+            elif isinstance(child, (HtmlComponent, Component, For)):
+                yield from child.stream()
+
+        yield f"</{self._tag}>"
+
+    def hydrate(self, cursor: Cursor) -> Element:
+        """Attaches to the element rendered by `stream` at the position of `cursor`."""
+        self._element = Element.wrap(cursor.claim_element(self._tag))
+        self._element.parent = Element.wrap(cursor.parent)
+        children = Cursor(self._element.node)
+
+        for child in self._children:
+            # Static text doesn't need to be claimed, the cursor skips it.
+            if callable(child) and not isinstance(child, (HtmlComponent, Component, For)):
+                UpdateableStr(child).hydrate(children)
+            elif isinstance(child, (HtmlComponent, Component, For)):
+                child.hydrate(children)
+
+        for key, value in self._attributes.items():
+            if callable(value):
+                self.set_attribute(key, value, hydrating=True)
+
+        return self._element
+
+    def set_class(self, value: Attribute) -> None:
+        self.set_attribute("class", value)
+
+    def set_attribute(self, key: str, value: Attribute, hydrating: bool = False) -> None:
+        """
+        Sets the attribute on the rendered element. A function is run in its own effect,
+        which touches the DOM only when the function's value differs from the last one.
+        When `hydrating`, the element already carries the attribute rendered by the server.
+        """
+        element = self._element
+        if key.startswith(EVENT_PREFIX):
+            self._set_handler(key[len(EVENT_PREFIX):].lower(), value)
+            return
+        if not callable(value):
+            _apply_attribute(element, key, value)
+            return
+
+        func = value
+        current: List[Union[str, bool, None]] = []
+        if hydrating:
+            # The value rendered by the server, read without tracking it in the caller.
+            current.append(runWithOwner(None, func))
+
+        def _update() -> None:
+            new_value = func()
+            if current and current[0] == new_value:
+                return
+            if _trace.enabled:
+                _trace.debug("update attribute", key=key, value=new_value)
+            _apply_attribute(element, key, new_value)
+            current[:] = [new_value]
+
+        createEffect(_update, name=f"attribute {key}")
+
+    def _set_handler(self, event_type: str, handler: Any) -> None:
+        element = self._element
+        delegator.add(element, event_type, handler)
+        if getOwner() is not None:
+            cleanUp(lambda: delegator.remove(element, event_type))
+
+
+def _stream_attributes(attributes: Mapping[str, Attribute]) -> str:
+    html = ""
+    for key, value in attributes.items():
+        if key.startswith(EVENT_PREFIX):
+            continue
+        value = value() if callable(value) else value
+        if value is True:
+            html += f' {key}=""'
+        elif value is not None and value is not False:
+            html += f' {key}="{escape(str(value))}"'
+    return html
+
+
+def _apply_attribute(element: Element, key: str, value: Union[str, bool, None]) -> None:
+    if value is None or value is False:
+        element.remove_attribute(key)
+    elif value is True:
+        element.set_attribute(key, "")
+    else:
+        element.set_attribute(key, str(value))
+
+
+class For(Generic[T]):
+    """
+    Keyed list: renders a component for every item of the list returned by `each`.
+
+    Components are created once per key (`key(item)`, by default the item itself) and
+    their DOM nodes are reused when the list changes, as long as the item with that key
+    doesn't change (see `mapArray`). Only the nodes of added and removed
+    items are inserted and removed, and reordering moves the fewest possible nodes: the
+    nodes forming the longest increasing subsequence of their old positions stay put.
+    """
+
+    def __init__(
+        self,
+        each: Callable[[], Sequence[T] | None],
+        render_item: Callable[[T], Component | HtmlComponent],
+        key: Callable[[T], Hashable] | None = None,
+    ):
+        self._each = each
+        self._render_item = render_item
+        self._key = key
+        self._nodes: List[Element] = []
+
+    def render(self, parent: Element) -> Element:
+        self._parent = parent
+        # Items are inserted before this (empty) anchor node, so siblings after the list
+        # keep their position.
+        self._end = Comment("/for")
+        parent.append_child(self._end)
+
+        elements = mapArray(self._each, lambda item: self._render_item(item).render(), self._key)
+        createEffect(lambda: self._reconcile(elements() or []))
+        return parent
+
+    def stream(self) -> Iterator[str]:
+        yield "<!--for-->"
+        for item in self._each() or []:
+            yield from self._render_item(item).stream()
+        yield "<!--/for-->"
+
+    def hydrate(self, cursor: Cursor) -> Element:
+        cursor.claim_comment("for")
+        self._parent = Element.wrap(cursor.parent)
+
+        # The initial items claim the nodes rendered by the server, later ones are rendered.
+        hydrating = [True]
+
+        def _build(item: T) -> Element:
+            component = self._render_item(item)
+            return component.hydrate(cursor) if hydrating[0] else component.render()
+
+        elements = mapArray(self._each, _build, self._key)
+        # Read without tracking, the enclosing computation doesn't depend on the list.
+        self._nodes = runWithOwner(None, lambda: elements() or [])
+        hydrating[0] = False
+        self._end = Comment.wrap(cursor.claim_comment("/for"))
+        createEffect(lambda: self._reconcile(elements() or []))
+        return self._parent
+
+    def _reconcile(self, nodes: List[Element]) -> None:
+        if _trace.enabled:
+            _trace.debug("reconcile list", old=len(self._nodes), new=len(nodes))
+
+        parent = self._parent
+        old_positions = {node: i for i, node in enumerate(self._nodes)}
+        new_nodes = set(nodes)
+        for node in self._nodes:
+            if node not in new_nodes:
+                parent.remove_child(node)
+
+        positions = [old_positions.get(node, -1) for node in nodes]
+        in_place = set(longest_increasing_subsequence(positions))
+
+        # Walk backwards, so that the reference node is always at its final position.
+        ref: Node = self._end
+        for i in range(len(nodes) - 1, -1, -1):
+            node = nodes[i]
+            if i not in in_place:
+                parent.insert_before(node, ref)
+            ref = node
+
+        self._nodes = nodes
+
+
+ELEMENT_NODE = 1
+TEXT_NODE = 3
+COMMENT_NODE = 8
+
+
+class Cursor:
+    """
+    Walks the children of a server-rendered DOM node while hydrating. Text nodes are
+    skipped unless claimed through the comment markers around dynamic text.
+    """
+
+    def __init__(self, parent: Any):
+        self.parent = parent
+        self._nodes = list(parent.childNodes)
+        self._index = 0
+
+    def peek(self) -> Any:
+        """Next unclaimed node, or `None`."""
+        return self._nodes[self._index] if self._index < len(self._nodes) else None
+
+    def _claim(self, node_type: int, matches: Callable[[Any], bool], expected: str) -> Any:
+        while self._index < len(self._nodes):
+            node = self._nodes[self._index]
+            self._index += 1
+            if node.nodeType == node_type and matches(node):
+                return node
+            if node.nodeType != TEXT_NODE:
+                break
+        raise ValueError(f"Hydration mismatch: expected {expected}")
+
+    def claim_element(self, tag: str) -> Any:
+        return self._claim(ELEMENT_NODE, lambda node: node.tagName.lower() == tag.lower(), tag)
+
+    def claim_comment(self, data: str) -> Any:
+        return self._claim(COMMENT_NODE, lambda node: node.data == data, f"<!--{data}-->")
+
+
+def render_to_stream(component: Component | HtmlComponent) -> Iterator[str]:
+    """
+    Renders `component` to HTML, chunk by chunk, without creating any DOM nodes. Functions
+    are evaluated once with their current value, and the output can be `hydrate`d.
+    """
+    # Reads aren't tracked: signals would otherwise subscribe the calling computation.
+    root: Computation[Any] = Computation(None, name="render_to_stream")
+    chunks = runWithOwner(root, component.stream)
+    try:
+        while True:
+            chunk = runWithOwner(root, lambda: next(chunks, None))
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        root.cleanup()
+
+
+def render_to_string(component: Component | HtmlComponent) -> str:
+    """Renders `component` to a string of HTML, see `render_to_stream`."""
+    return "".join(render_to_stream(component))
+
+
+def hydrate(component: Component | HtmlComponent, container: Element) -> Element:
+    """
+    Attaches `component` to the HTML rendered by `render_to_stream` inside `container`.
+    Existing nodes are reused instead of created, and only updated when signals change.
+    """
+    return component.hydrate(Cursor(container.node))
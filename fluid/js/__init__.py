@@ -1,34 +1,173 @@
 # Copyright 2022 (c) Vincent Dutordoir
 # SPDX-License-Identifier: Apache-2.0
 
-"""Mocks for DOM handling through Javascript."""
+"""
+Mocks for DOM handling through Javascript.
 
-from __future__ import annotations
+The DOM backend is selected at import time by the `FLUID_DOM_BACKEND` environment
+variable: `pyodide` uses the browser's DOM through Pyodide's `js` module and `headless`
+an in-memory DOM (see `fluid.js.headless`). By default the browser's DOM is used when
+available.
+"""
 
-from js import console, document  # type: ignore
+from __future__ import annotations
 
-__all__ = ["Element", "TextNode", "Console"]
+import os
+from typing import Any, Callable, List, Optional, Union
+
+from fluid.js import mutations
+from fluid.js.mutations import Mutation, MutationQueue
+from fluid.signal import microtask
+
+__all__ = [
+    "Element",
+    "TextNode",
+    "Comment",
+    "Console",
+    "queue",
+    "document",
+    "request_animation_frame",
+    "BACKEND",
+]
+
+BACKEND = os.getenv("FLUID_DOM_BACKEND", "")
+"""Name of the DOM backend in use: `pyodide` or `headless`."""
+
+document: Any
+console: Any
+
+if BACKEND not in ("", "pyodide", "headless"):
+    raise ValueError(f"Unknown DOM backend FLUID_DOM_BACKEND={BACKEND}")
+
+if BACKEND in ("", "pyodide"):
+    try:
+        from js import console, document  # type: ignore
+        BACKEND = "pyodide"
+    except ImportError:
+        if BACKEND == "pyodide":
+            raise
+
+if BACKEND != "pyodide":
+    from fluid.js.headless import console, document
+    BACKEND = "headless"
+
+
+def _bulk_applier() -> Optional[Callable[[List[Mutation]], None]]:
+    # Applies a complete queue of mutations in a single call into JS, if supported.
+    if BACKEND != "pyodide":
+        return None
+    try:
+        from js import Function
+        try:
+            from pyodide.ffi import to_js  # type: ignore
+        except ImportError:
+            from pyodide import to_js  # type: ignore
+    except ImportError:
+        return None
+
+    apply_mutations = Function.new("mutations", mutations.APPLY_MUTATIONS_JS)
+    return lambda queued: apply_mutations(to_js(queued))
+
+
+queue = MutationQueue(_bulk_applier())
+"""DOM mutations made during a `Batch` are collected here and applied when it ends."""
+
+
+def request_animation_frame(callback: Callable[[], None]) -> None:
+    """
+    Clock for `fluid.signal.setFrameScheduler`, calling back before the browser's next
+    repaint. Without a browser it falls back to the next turn of the asyncio event loop.
+    """
+    if BACKEND != "pyodide":
+        microtask(callback)
+        return
+    from js import requestAnimationFrame
+    try:
+        from pyodide.ffi import create_once_callable
+    except ImportError:
+        from pyodide import create_once_callable
+    requestAnimationFrame(create_once_callable(lambda timestamp: callback()))
 
 
 class Element:
+    handler_id: Optional[str] = None
+    """Identifies the element to the delegated event handlers, see `fluid.js.events`."""
+    parent: Optional[Element] = None
+    """
+    Element into which this element was last inserted, `None` if it was removed. Unlike
+    `node.parentNode`, it is up-to-date while the mutations of a batch are queued.
+    """
 
     def __init__(self, tag: str):
+        queue.count_crossing()
         self.node = document.createElement(tag)
 
+    @classmethod
+    def wrap(cls, node: Any) -> Element:
+        """Wraps an existing DOM element, e.g. one rendered by the server."""
+        element = cls.__new__(cls)
+        element.node = node
+        return element
+
     def set_attribute(self, key: str, value: str) -> None:
-        self.node.setAttribute(key, value)
+        queue.push(mutations.SET_ATTRIBUTE, self.node, key, value)
+
+    def remove_attribute(self, key: str) -> None:
+        queue.push(mutations.REMOVE_ATTRIBUTE, self.node, key)
 
-    def append_child(self, el: "Element" | TextNode) -> Element:
-        return self.node.appendChild(el.node)  # type: ignore
+    def append_child(self, el: Node) -> Node:
+        el.parent = self
+        queue.push(mutations.APPEND_CHILD, self.node, el.node)
+        return el
+
+    def insert_before(self, el: Node, ref: Node | None) -> None:
+        """Inserts `el` before the child `ref`, or appends it if `ref` is `None`."""
+        el.parent = self
+        queue.push(mutations.INSERT_BEFORE, self.node, el.node, None if ref is None else ref.node)
+
+    def remove_child(self, el: Node) -> None:
+        el.parent = None
+        queue.push(mutations.REMOVE_CHILD, self.node, el.node)
 
 
 class TextNode:
+    parent: Optional[Element] = None
+    """Element into which this node was last inserted, see `Element.parent`."""
 
     def __init__(self, text: str):
+        queue.count_crossing()
         self.node = document.createTextNode(text)
 
+    @classmethod
+    def wrap(cls, node: Any) -> TextNode:
+        """Wraps an existing DOM text node, e.g. one rendered by the server."""
+        text = cls.__new__(cls)
+        text.node = node
+        return text
+
     def update_text(self, text: str) -> None:
-        self.node.nodeValue = text
+        queue.push(mutations.SET_TEXT, self.node, text)
+
+
+class Comment:
+    """Comment node, used to mark positions in the DOM."""
+
+    parent: Optional[Element] = None
+    """Element into which this node was last inserted, see `Element.parent`."""
+
+    def __init__(self, data: str):
+        queue.count_crossing()
+        self.node = document.createComment(data)
+
+    @classmethod
+    def wrap(cls, node: Any) -> Comment:
+        """Wraps an existing DOM comment node, e.g. one rendered by the server."""
+        comment = cls.__new__(cls)
+        comment.node = node
+        return comment
+
+
+Node = Union[Element, TextNode, Comment]
 
 
 class Console:
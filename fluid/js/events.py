@@ -0,0 +1,109 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Delegated DOM events.
+
+Instead of a listener per element, which in Pyodide means a JS proxy per handler, a
+single listener per event type is added to the document. It dispatches events to the
+Python handlers of the elements on the event's path, looked up by the element's
+`HANDLER_ID` attribute.
+"""
+
+from __future__ import annotations
+
+import itertools
+from typing import Any, Callable, Dict
+
+from fluid.js import BACKEND, Element, document
+from fluid.signal import batch
+
+__all__ = ["EventDelegator", "delegator", "HANDLER_ID"]
+
+HANDLER_ID = "data-pys-id"
+"""Attribute identifying the elements with event handlers."""
+
+NON_BUBBLING = frozenset(["blur", "focus", "load", "mouseenter", "mouseleave", "scroll"])
+"""Events that don't bubble, these are listened to in the capture phase instead."""
+
+Handler = Callable[[Any], None]
+
+_ids = itertools.count(1)
+
+
+def _create_proxy(function: Handler) -> Any:
+    if BACKEND != "pyodide":
+        return function
+    try:
+        from pyodide.ffi import create_proxy  # type: ignore
+    except ImportError:
+        from pyodide import create_proxy  # type: ignore
+    return create_proxy(function)
+
+
+class EventDelegator:
+    """
+    Dispatches the events of `root` to the handlers registered with `add`.
+
+    Handlers are called in a `batch`, so all the signals they assign are committed, and
+    the resulting DOM mutations flushed, at once when the event has been handled.
+    """
+
+    def __init__(self, root: Any):
+        self._root = root
+        self.handlers: Dict[str, Dict[str, Handler]] = {}
+        """Handlers by event type and id of their element."""
+        self._listeners: Dict[str, Any] = {}
+        self.dispatched = 0
+        """Number of events dispatched to a handler."""
+
+    def add(self, element: Element, event_type: str, handler: Handler) -> None:
+        """Calls `handler(event)` for `event_type` events on `element` or its descendants."""
+        if not callable(handler):
+            raise TypeError(f"Handler of '{event_type}' events must be a callable taking the "
+                            f"event, got {handler!r}")
+        if element.handler_id is None:
+            element.handler_id = str(next(_ids))
+            element.set_attribute(HANDLER_ID, element.handler_id)
+
+        if event_type not in self._listeners:
+            listener = _create_proxy(self._dispatch)
+            self._listeners[event_type] = listener
+            self._root.addEventListener(event_type, listener, event_type in NON_BUBBLING)
+        self.handlers.setdefault(event_type, {})[element.handler_id] = handler
+
+    def remove(self, element: Element, event_type: str) -> None:
+        handlers = self.handlers.get(event_type)
+        if handlers is not None and element.handler_id is not None:
+            handlers.pop(element.handler_id, None)
+
+    def _dispatch(self, event: Any) -> None:
+        handlers = self.handlers.get(event.type)
+        if not handlers:
+            return
+        if batch.activated:
+            self._bubble(event, handlers)
+        else:
+            with batch:
+                self._bubble(event, handlers)
+
+    def _bubble(self, event: Any, handlers: Dict[str, Handler]) -> None:
+        # Calls the handlers from the target up to the root, like a bubbling event. Events
+        # that don't bubble only reach the handler of their target.
+        node = event.target
+        bubbles = event.type not in NON_BUBBLING
+        while node is not None and node is not self._root:
+            if node.nodeType == 1:
+                handler = handlers.get(node.getAttribute(HANDLER_ID))
+                if handler is not None:
+                    self.dispatched += 1
+                    handler(event)
+                    if event.cancelBubble:
+                        return
+            if not bubbles:
+                return
+            node = node.parentNode
+
+
+delegator = EventDelegator(document)
+"""Delegates the events of the whole document."""
@@ -0,0 +1,265 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+In-memory DOM backend for rendering outside of the browser, e.g. in tests and benchmarks.
+
+Implements the subset of the JS DOM API used by `fluid.js`, with the same method names,
+and counts every operation made on the document.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from html import escape
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+__all__ = [
+    "document",
+    "console",
+    "HeadlessDocument",
+    "HeadlessElement",
+    "HeadlessText",
+    "HeadlessComment",
+    "HeadlessEvent",
+    "VOID_ELEMENTS",
+]
+
+VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source",
+    "track", "wbr"
+])
+"""Elements without content, which are serialized without a closing tag."""
+
+
+class HeadlessNode:
+    __slots__ = ("ownerDocument", "parentNode", "childNodes")
+
+    def __init__(self, document: HeadlessDocument):
+        self.ownerDocument = document
+        self.parentNode: Optional[HeadlessElement] = None
+        self.childNodes: List[HeadlessNode] = []
+
+    @property
+    def textContent(self) -> str:
+        return "".join(child.textContent for child in self.childNodes)
+
+    @property
+    def outerHTML(self) -> str:
+        raise NotImplementedError
+
+    def dispatchEvent(self, event: HeadlessEvent) -> bool:
+        # Only the document has listeners, see `HeadlessDocument.addEventListener`.
+        event.target = self
+        for listener in list(self.ownerDocument.listeners.get(event.type, ())):
+            listener(event)
+        return not event.defaultPrevented
+
+
+class HeadlessEvent:
+    __slots__ = ("type", "target", "cancelBubble", "defaultPrevented")
+
+    def __init__(self, type: str):
+        self.type = type
+        self.target: Optional[HeadlessNode] = None
+        self.cancelBubble = False
+        self.defaultPrevented = False
+
+    def stopPropagation(self) -> None:
+        self.cancelBubble = True
+
+    def preventDefault(self) -> None:
+        self.defaultPrevented = True
+
+
+class HeadlessText(HeadlessNode):
+    __slots__ = ("_value", )
+    nodeType = 3
+
+    def __init__(self, document: HeadlessDocument, text: str):
+        super().__init__(document)
+        self._value = text
+
+    @property
+    def nodeValue(self) -> str:
+        return self._value
+
+    @nodeValue.setter
+    def nodeValue(self, text: str) -> None:
+        self.ownerDocument.counts["nodeValue"] += 1
+        self._value = text
+
+    @property
+    def textContent(self) -> str:
+        return self._value
+
+    @property
+    def outerHTML(self) -> str:
+        return escape(self._value, quote=False)
+
+
+class HeadlessComment(HeadlessNode):
+    __slots__ = ("data", )
+    nodeType = 8
+
+    def __init__(self, document: HeadlessDocument, data: str):
+        super().__init__(document)
+        self.data = data
+
+    @property
+    def textContent(self) -> str:
+        return ""
+
+    @property
+    def outerHTML(self) -> str:
+        return f"<!--{self.data}-->"
+
+
+class HeadlessElement(HeadlessNode):
+    __slots__ = ("tagName", "attributes")
+    nodeType = 1
+
+    def __init__(self, document: HeadlessDocument, tag: str):
+        super().__init__(document)
+        self.tagName = tag.upper()
+        self.attributes: Dict[str, str] = {}
+
+    def _detach(self, child: HeadlessNode) -> None:
+        if child.parentNode is not None:
+            child.parentNode.childNodes.remove(child)
+        child.parentNode = self
+
+    def appendChild(self, child: HeadlessNode) -> HeadlessNode:
+        self.ownerDocument.counts["appendChild"] += 1
+        self._detach(child)
+        self.childNodes.append(child)
+        return child
+
+    def insertBefore(self, child: HeadlessNode, ref: Optional[HeadlessNode]) -> HeadlessNode:
+        self.ownerDocument.counts["insertBefore"] += 1
+        self._detach(child)
+        if ref is None:
+            self.childNodes.append(child)
+        else:
+            self.childNodes.insert(self.childNodes.index(ref), child)
+        return child
+
+    def removeChild(self, child: HeadlessNode) -> HeadlessNode:
+        self.ownerDocument.counts["removeChild"] += 1
+        self.childNodes.remove(child)
+        child.parentNode = None
+        return child
+
+    def setAttribute(self, key: str, value: str) -> None:
+        self.ownerDocument.counts["setAttribute"] += 1
+        self.attributes[key] = str(value)
+
+    def removeAttribute(self, key: str) -> None:
+        self.ownerDocument.counts["removeAttribute"] += 1
+        self.attributes.pop(key, None)
+
+    def getAttribute(self, key: str) -> Optional[str]:
+        return self.attributes.get(key)
+
+    @property
+    def innerHTML(self) -> str:
+        return "".join(child.outerHTML for child in self.childNodes)
+
+    @innerHTML.setter
+    def innerHTML(self, html: str) -> None:
+        # Parsing isn't counted: like in the browser, no DOM method is called.
+        for child in self.childNodes:
+            child.parentNode = None
+        self.childNodes = []
+        parser = _Parser(self)
+        parser.feed(html)
+        parser.close()
+
+    @property
+    def outerHTML(self) -> str:
+        tag = self.tagName.lower()
+        attributes = "".join(f' {key}="{escape(value)}"' for key, value in self.attributes.items())
+        if tag in VOID_ELEMENTS:
+            return f"<{tag}{attributes}>"
+        return f"<{tag}{attributes}>{self.innerHTML}</{tag}>"
+
+
+class _Parser(HTMLParser):
+    """Builds the nodes of an HTML fragment into `root`."""
+
+    def __init__(self, root: HeadlessElement):
+        super().__init__(convert_charrefs=True)
+        self._document = root.ownerDocument
+        self._stack = [root]
+
+    def _add(self, node: HeadlessNode) -> None:
+        node.parentNode = self._stack[-1]
+        self._stack[-1].childNodes.append(node)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        element = HeadlessElement(self._document, tag)
+        element.attributes = {key: value or "" for key, value in attrs}
+        self._add(element)
+        if tag not in VOID_ELEMENTS:
+            self._stack.append(element)
+
+    def handle_endtag(self, tag: str) -> None:
+        if len(self._stack) > 1 and self._stack[-1].tagName.lower() == tag:
+            self._stack.pop()
+
+    def handle_data(self, data: str) -> None:
+        self._add(HeadlessText(self._document, data))
+
+    def handle_comment(self, data: str) -> None:
+        self._add(HeadlessComment(self._document, data))
+
+
+class HeadlessDocument:
+    __slots__ = ("counts", "body", "listeners")
+
+    def __init__(self) -> None:
+        self.counts: Counter[str] = Counter()
+        """Number of operations made on the document, by name of the DOM method."""
+        self.body = HeadlessElement(self, "body")
+        self.listeners: Dict[str, List[Callable[[Any], None]]] = {}
+
+    def addEventListener(self,
+                         type: str,
+                         listener: Callable[[Any], None],
+                         capture: bool = False) -> None:
+        self.counts["addEventListener"] += 1
+        self.listeners.setdefault(type, []).append(listener)
+
+    def removeEventListener(self,
+                            type: str,
+                            listener: Callable[[Any], None],
+                            capture: bool = False) -> None:
+        self.counts["removeEventListener"] += 1
+        self.listeners.get(type, []).remove(listener)
+
+    def createElement(self, tag: str) -> HeadlessElement:
+        self.counts["createElement"] += 1
+        return HeadlessElement(self, tag)
+
+    def createTextNode(self, text: str) -> HeadlessText:
+        self.counts["createTextNode"] += 1
+        return HeadlessText(self, text)
+
+    def createComment(self, data: str) -> HeadlessComment:
+        self.counts["createComment"] += 1
+        return HeadlessComment(self, data)
+
+
+class HeadlessConsole:
+    __slots__ = ("messages", )
+
+    def __init__(self) -> None:
+        self.messages: List[str] = []
+
+    def log(self, s: str) -> None:
+        self.messages.append(s)
+
+
+document = HeadlessDocument()
+console = HeadlessConsole()
@@ -0,0 +1,137 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""Queue collecting DOM mutations during a `Batch`, applied at once when the batch ends."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fluid.signal import Batch, Runtime, getRuntime
+
+__all__ = ["MutationQueue", "APPLY_MUTATIONS_JS"]
+
+APPEND_CHILD = 0
+INSERT_BEFORE = 1
+REMOVE_CHILD = 2
+SET_ATTRIBUTE = 3
+REMOVE_ATTRIBUTE = 4
+SET_TEXT = 5
+
+Mutation = Tuple[int, Any, Any, Any]
+"""Operation code, target node and (up to) two arguments."""
+
+APPLY_MUTATIONS_JS = """
+for (const [op, node, a, b] of mutations) {
+    switch (op) {
+        case 0: node.appendChild(a); break;
+        case 1: node.insertBefore(a, b === undefined ? null : b); break;
+        case 2: node.removeChild(a); break;
+        case 3: node.setAttribute(a, b); break;
+        case 4: node.removeAttribute(a); break;
+        case 5: node.nodeValue = a; break;
+    }
+}
+"""
+"""Body of a JS function taking `mutations`, applying the whole queue in one bridge call."""
+
+
+def _apply(mutation: Mutation) -> None:
+    op, node, a, b = mutation
+    if op == APPEND_CHILD:
+        node.appendChild(a)
+    elif op == INSERT_BEFORE:
+        node.insertBefore(a, b)
+    elif op == REMOVE_CHILD:
+        node.removeChild(a)
+    elif op == SET_ATTRIBUTE:
+        node.setAttribute(a, b)
+    elif op == REMOVE_ATTRIBUTE:
+        node.removeAttribute(a)
+    elif op == SET_TEXT:
+        node.nodeValue = a
+
+
+class _Pending:
+    """Mutations queued by the active batch of a runtime."""
+
+    __slots__ = ("mutations", "positions")
+
+    def __init__(self) -> None:
+        self.mutations: List[Mutation] = []
+        self.positions: Dict[Tuple[int, int, Any], int] = {}
+        """Position in the queue of the latest write to an attribute or text."""
+
+
+class MutationQueue:
+    """
+    Collects DOM mutations while a `Batch` is active and applies them when it ends.
+
+    Outside of a batch mutations are applied immediately. Repeated writes of the same
+    attribute or text within a batch are coalesced into the last one. Every runtime
+    queues its own mutations, which are applied when its batch ends. If `apply_all` is
+    given, it applies the complete queue in a single call into JS, otherwise every
+    mutation crosses the bridge separately.
+    """
+
+    def __init__(self, apply_all: Optional[Callable[[List[Mutation]], None]] = None):
+        self._apply_all = apply_all
+        self._pending: Dict[Runtime, _Pending] = {}
+        """Mutations by runtime, removed when they are flushed."""
+        self.crossings = 0
+        """Total number of calls from Python into the DOM."""
+        self.last_flush_crossings = 0
+        """Number of calls into the DOM made by the last flush."""
+        self.flushes = 0
+        Batch.flush_hooks.append(self.flush)
+
+    def __len__(self) -> int:
+        """Number of mutations queued by the current runtime."""
+        pending = self._pending.get(getRuntime())
+        return 0 if pending is None else len(pending.mutations)
+
+    def count_crossing(self) -> None:
+        """Records a call into the DOM that isn't queued, e.g. node creation."""
+        self.crossings += 1
+
+    def push(self, op: int, node: Any, a: Any = None, b: Any = None) -> None:
+        mutation = (op, node, a, b)
+        runtime = getRuntime()
+        if not runtime.batch.activated:
+            self.crossings += 1
+            _apply(mutation)
+            return
+
+        pending = self._pending.get(runtime)
+        if pending is None:
+            pending = self._pending[runtime] = _Pending()
+        if op in (SET_ATTRIBUTE, REMOVE_ATTRIBUTE, SET_TEXT):
+            # Setting and removing an attribute write the same slot.
+            slot = (id(node), SET_TEXT if op == SET_TEXT else SET_ATTRIBUTE,
+                    None if op == SET_TEXT else a)
+            position = pending.positions.get(slot)
+            if position is not None:
+                pending.mutations[position] = mutation
+                return
+            pending.positions[slot] = len(pending.mutations)
+
+        pending.mutations.append(mutation)
+
+    def flush(self) -> None:
+        """Applies the mutations queued by the current runtime."""
+        pending = self._pending.pop(getRuntime(), None)
+        if pending is None or not pending.mutations:
+            return
+
+        mutations = pending.mutations
+        if self._apply_all is not None:
+            crossings = 1
+            self._apply_all(mutations)
+        else:
+            crossings = len(mutations)
+            for mutation in mutations:
+                _apply(mutation)
+
+        self.flushes += 1
+        self.last_flush_crossings = crossings
+        self.crossings += crossings
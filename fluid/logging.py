@@ -2,20 +2,91 @@
 # SPDX-License-Identifier: Apache-2.0
 
 # type: ignore
+from __future__ import annotations
+
 import atexit
+import logging
 import os
+from typing import Any, Callable, Dict
 
-from fluid.signal import Computation, INode, Signal
-
-# __all__ = ["log"]
+# __all__ = ["log", "get_tracer", "enable_tracing", "disable_tracing"]
 
 GRAPH = int(os.getenv("GRAPH", "0"))
 
+TRACE = os.getenv("FLUID_TRACE", "")
+"""Comma-separated list of subsystems (e.g. `batch,render`) to trace from start-up, or `all`."""
+
+TraceSink = Callable[[str, int, str, Dict[str, Any]], None]
+"""Receives the subsystem, level, event name and fields of every emitted trace event."""
+
+
+def _log_sink(subsystem: str, level: int, event: str, fields: Dict[str, Any]) -> None:
+    logging.getLogger(f"fluid.{subsystem}").log(level, "%s %s", event, fields)
+
+
+class Tracer:
+    """
+    Structured trace events of a single subsystem.
+
+    Tracing is disabled by default. Call sites guard event construction behind the
+    `enabled` attribute, so a disabled tracer costs a single attribute lookup:
+    ```
+    if _trace.enabled:
+        _trace.debug("commit", signal=signal)
+    ```
+    """
+
+    __slots__ = ("subsystem", "enabled", "level", "sink")
+
+    def __init__(self, subsystem: str):
+        self.subsystem = subsystem
+        self.enabled = False
+        self.level = logging.DEBUG
+        self.sink: TraceSink = _log_sink
+
+    def emit(self, level: int, event: str, **fields: Any) -> None:
+        if self.enabled and level >= self.level:
+            self.sink(self.subsystem, level, event, fields)
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self.emit(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self.emit(logging.INFO, event, **fields)
+
+
+_TRACERS: Dict[str, Tracer] = {}
+
+
+def get_tracer(subsystem: str) -> Tracer:
+    """Returns the tracer of `subsystem`, enabled if listed in the `FLUID_TRACE` variable."""
+    if subsystem not in _TRACERS:
+        tracer = _TRACERS[subsystem] = Tracer(subsystem)
+        requested = {s.strip() for s in TRACE.split(",")}
+        tracer.enabled = subsystem in requested or "all" in requested
+    return _TRACERS[subsystem]
+
+
+def enable_tracing(*subsystems: str, level: int = logging.DEBUG, sink: TraceSink | None = None):
+    """Enables tracing of the given subsystems, or of all known subsystems if none are given."""
+    for subsystem in subsystems or list(_TRACERS):
+        tracer = get_tracer(subsystem)
+        tracer.enabled = True
+        tracer.level = level
+        tracer.sink = sink or _log_sink
+
+
+def disable_tracing(*subsystems: str):
+    """Disables tracing of the given subsystems, or of all subsystems if none are given."""
+    for subsystem in subsystems or list(_TRACERS):
+        get_tracer(subsystem).enabled = False
+
+
 NODE_COLORS = {
-    Signal: "#FFFF80",
-    Computation: "#C0C0C0",
+    "Signal": "#FFFF80",
+    "Computation": "#C0C0C0",
 }
-NODE_SHAPE = {Signal: "box", Computation: "ellipse"}
+NODE_SHAPE = {"Signal": "box", "Computation": "ellipse"}
 
 if GRAPH:
     import networkx as nx
@@ -29,45 +100,54 @@ if GRAPH:
 
     atexit.register(save_graph_exit)
 
-global_num_max = 0
+NODE_NUMBERS = {}
 
 
 def nm(x):
-    global global_num_max
-    if getattr(x, "global_num", None) is None:
-        setattr(x, "global_num", global_num_max)
-        global_num_max += 1
-    return f"< {x.global_num} >"
+    # nodes are slotted, so the numbers are kept here rather than on the nodes
+    if x not in NODE_NUMBERS:
+        NODE_NUMBERS[x] = len(NODE_NUMBERS)
+    return f"< {NODE_NUMBERS[x]} >"
 
 
-def log(*nodes: INode):
+def log(*nodes):
     for node in nodes:
         _log(node)
 
 
-def _log(root: INode):
-    G.add_node(nm(root))
+def _log(root):
+    # imported here as `fluid.signal` itself depends on the tracers of this module
+    from fluid.signal import Computation, Signal
 
-    def _style_node(cls):
-        G.nodes[nm(root)]["fillcolor"] = NODE_COLORS[cls]
-        G.nodes[nm(root)]["shape"] = NODE_SHAPE[cls]
+    def _style_node(node, cls):
+        G.nodes[nm(node)]["fillcolor"] = NODE_COLORS[cls]
+        G.nodes[nm(node)]["shape"] = NODE_SHAPE[cls]
 
-        if isinstance(root, Signal):
-            G.nodes[nm(root)]["label"] = str(root())
-        elif isinstance(root, Computation):
-            G.nodes[nm(root)]["label"] = root.name or "Anonymous comp."
+        if isinstance(node, Signal):
+            G.nodes[nm(node)]["label"] = str(node())
+        elif isinstance(node, Computation):
+            G.nodes[nm(node)]["label"] = node.name or "Anonymous comp."
 
         style = "filled"
-        if isinstance(root, Signal) and root.computation is not None:
+        if isinstance(node, Signal) and node.computation is not None:
             style = "dashed, filled"
-        G.nodes[nm(root)]["style"] = style
-
-    if isinstance(root, Signal):
-        _style_node(Signal)
-    elif isinstance(root, Computation):
-        _style_node(Computation)
-
-    for child in root.get_children():
-        G.add_node(nm(child))
-        G.add_edge(nm(root), nm(child))
-        log(child)
+        G.nodes[nm(node)]["style"] = style
+
+    visited = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node in visited:
+            continue
+        visited.add(node)
+
+        G.add_node(nm(node))
+        if isinstance(node, Signal):
+            _style_node(node, "Signal")
+        elif isinstance(node, Computation):
+            _style_node(node, "Computation")
+
+        for child in node.get_children():
+            G.add_node(nm(child))
+            G.add_edge(nm(node), nm(child))
+            stack.append(child)
@@ -0,0 +1,172 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Memos computed in a process pool, for CPU-heavy functions which would otherwise hold the
+GIL. Large buffers, such as NumPy arrays, are handed to the worker processes through
+shared memory instead of being pickled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import pickle
+import warnings
+from concurrent.futures import Executor, Future
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Sequence, Tuple, TypeVar, cast
+
+from fluid.signal import Runtime, Signal, cleanUp, createEffect
+
+__all__ = ["createOffloadedMemo", "SHARED_MEMORY_THRESHOLD"]
+
+T = TypeVar("T")
+
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+"""Buffers of at least this many bytes are shared with the workers instead of pickled."""
+
+Shared = Tuple[str, str, str, Tuple[int, ...], int]
+"""Input in shared memory: kind (`numpy` or `buffer`), block name, format, shape and size."""
+
+
+def _is_numpy(value: Any) -> bool:
+    return type(value).__module__ == "numpy" and hasattr(value, "dtype")
+
+
+def _share(value: Any, blocks: List[shared_memory.SharedMemory]) -> Any:
+    # Copies a large buffer into a new shared memory block, other values are pickled.
+    try:
+        view = memoryview(value)
+    except TypeError:
+        return value
+    if view.nbytes < SHARED_MEMORY_THRESHOLD or not view.contiguous:
+        return value
+
+    block = shared_memory.SharedMemory(create=True, size=view.nbytes)
+    blocks.append(block)
+    cast(memoryview, block.buf)[:view.nbytes] = view.cast("B")
+    kind = "numpy" if _is_numpy(value) else "buffer"
+    format = value.dtype.str if kind == "numpy" else view.format
+    return _SharedInput((kind, block.name, format, tuple(view.shape or ()), view.nbytes))
+
+
+class _SharedInput:
+    """Placeholder for an input in shared memory, replaced by a view on it in the worker."""
+
+    __slots__ = ("state", )
+
+    def __init__(self, state: Shared):
+        self.state = state
+
+    def __getstate__(self) -> Shared:
+        return self.state
+
+    def __setstate__(self, state: Shared) -> None:
+        self.state = state
+
+    def open(self, blocks: List[shared_memory.SharedMemory]) -> Any:
+        kind, name, format, shape, nbytes = self.state
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        if kind == "numpy":
+            import numpy  # type: ignore
+            return numpy.ndarray(shape, dtype=format, buffer=block.buf)
+        buffer: Any = cast(memoryview, block.buf)[:nbytes]
+        return buffer.cast(format, list(shape))
+
+
+def _run(function: Callable[..., Any], args: Sequence[Any]) -> bytes:
+    # Runs in the worker. The result is pickled here, while the shared memory is still
+    # open, as it may be a view on it.
+    blocks: List[shared_memory.SharedMemory] = []
+    try:
+        values = [arg.open(blocks) if isinstance(arg, _SharedInput) else arg for arg in args]
+        result = pickle.dumps(function(*values))
+        del values
+        return result
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # still viewed, e.g. by the traceback of an exception
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _wake(loop: asyncio.AbstractEventLoop | None, runtime: Runtime) -> None:
+    # Called from a thread of the executor after a result got posted: drains the runtime
+    # in the event loop in which the memo was created, unless the runtime wakes up itself.
+    if loop is None or runtime.wakeup is not None:
+        return
+    try:
+        loop.call_soon_threadsafe(runtime.run, runtime.drain)
+    except RuntimeError:
+        pass  # the loop is closed: the result waits for the runtime's next batch
+
+
+def createOffloadedMemo(inputs: Callable[[], Sequence[Any]],
+                        function: Callable[..., T],
+                        executor: Executor,
+                        initial_value: T | None = None,
+                        name: str | None = None) -> Signal[T]:
+    """
+    Creates a readonly `Signal` holding `function(*inputs())`, computed by `executor`,
+    typically a `ProcessPoolExecutor`. Like a memo, it is recomputed whenever the signals
+    read by `inputs` change, but `function` must be picklable and can't read signals
+    itself.
+
+    Inputs supporting the buffer protocol, e.g. NumPy arrays, of at least
+    `SHARED_MEMORY_THRESHOLD` bytes are copied once into shared memory, and `function`
+    receives a view on it: an array for NumPy arrays, a `memoryview` otherwise. Every
+    result notifies the subscribers of the signal, without being compared to the
+    previous one.
+
+    The signal keeps its previous value until the result arrives, which is then posted to
+    the signal's runtime (see `Runtime.post`). When created in a running asyncio event
+    loop, the loop assigns the result, together with the other results that arrived in the
+    meantime. Otherwise results are assigned in the runtime's next batch, or when it is
+    drained. Computations for outdated inputs are cancelled or discarded.
+    """
+    signal = Signal[T](initial_value, readonly=True, equals=False)
+    runtime = signal.runtime
+    latest: List[Future[bytes] | None] = [None]
+    loop = _running_loop()
+
+    def _done(future: Future[bytes], blocks: List[shared_memory.SharedMemory]) -> None:
+        # Called from a thread of the executor.
+        for block in blocks:
+            block.close()
+            block.unlink()
+        if future.cancelled() or future is not latest[0]:
+            return
+        exception = future.exception()
+        if exception is not None:
+            warnings.warn(f"Offloaded memo {name or function} failed: {exception!r}",
+                          RuntimeWarning)
+            return
+        runtime.post(signal, pickle.loads(future.result()))
+        _wake(loop, runtime)
+
+    def _submit() -> None:
+        blocks: List[shared_memory.SharedMemory] = []
+        args = [_share(value, blocks) for value in inputs()]
+        future = executor.submit(_run, function, args)
+        latest[0] = future
+        future.add_done_callback(lambda future: _done(future, blocks))
+
+        def _cancel() -> None:
+            # Runs when the inputs change, or when the memo is disposed.
+            if latest[0] is future:
+                latest[0] = None
+            future.cancel()
+
+        cleanUp(_cancel)
+
+    createEffect(_submit, name=name or "offloaded memo")
+    return signal
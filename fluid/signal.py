@@ -7,10 +7,32 @@
 from __future__ import annotations
 
 import abc
-from dataclasses import dataclass, field
-from enum import Enum
-from typing import Any, Callable, Generic, List, Set, TypeVar, cast
-
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import warnings
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    NamedTuple,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
+
+from fluid.logging import get_tracer  # type: ignore
 from fluid.utils import doublewrap
 
 T = TypeVar("T")
@@ -19,12 +41,47 @@ T = TypeVar("T")
 R = TypeVar("R")
 """Generic return type of functions wrapped as effects"""
 
+U = TypeVar("U")
+"""Generic type of mapped items"""
+
 VoidFunc = Callable[[], None]
 
+_trace = get_tracer("batch")
+
+_clock = itertools.count(1)
+"""
+Global clock stamping writes of signals and executions of computations. A computation is
+outdated when one of its sources got written after the computation started executing.
+"""
+
+_NO_SUBSCRIBERS = cast(Set[Any], frozenset())
+"""Shared by all signals without subscribers, replaced by a `set` on the first subscription."""
+
+Clock = Callable[[VoidFunc], Any]
+"""Calls back the given function later, e.g. at the next animation frame or microtask."""
+
+Equals = Union[Callable[[Any, Any], bool], bool]
+"""
+Comparator deciding if a new value of a `Signal` equals the old one, in which case
+subscribed computations are not notified. `True` compares with `==` (see `_equal`) and
+`False` notifies on every assignment.
+"""
+
+
+def _equal(old: Any, new: Any) -> bool:
+    # Identical values are equal. When `==` doesn't return a bool, e.g. as it compares
+    # NumPy arrays elementwise, the values are considered different.
+    if old is new:
+        return True
+    result = old == new
+    return result if type(result) is bool else False
+
 
 class INode(abc.ABC):
     """A node in the computation directed-graph."""
 
+    __slots__ = ()
+
     @abc.abstractmethod
     def get_parents(self) -> List[INode]:
         raise NotImplementedError
@@ -34,65 +91,187 @@ class INode(abc.ABC):
         raise NotADirectoryError
 
 
-@dataclass(frozen=False, eq=False)
 class Computation(Generic[R], INode):
+    __slots__ = ("function", "ret", "is_memo", "sources", "run", "reads", "cleanups", "owner",
+                 "children", "name", "height", "scheduled", "lazy", "observed")
+
     function: Callable[[], R] | None
     """Function to be recomputed on changing `Signal`s."""
-    ret: R | None = None
+    ret: R | None
     """Return value computation"""
-    is_memo: bool = False
+    is_memo: bool
     """Is `true` when computation returns a readonly-Signal"""
-    sources: Set[Signal[Any]] = field(default_factory=set)
-    """Set of `Signal`s the computation depends on."""
-    cleanups: Set[Callable[[], None]] = field(default_factory=set)
-    """Functions to be executed on updates and when computation is disposed."""
-    owner: Computation[Any] | None = None
+    sources: Dict[Signal[Any], int]
+    """`Signal`s the computation depends on, mapped to the last `run` in which they were read."""
+    run: int
+    """Number of the current (or last) execution, marks the sources read by that execution."""
+    reads: int
+    """Number of distinct sources read by the current execution."""
+    cleanups: List[Callable[[], None]] | None
+    """Functions to be executed on updates and when computation is disposed, allocated on demand."""
+    owner: Computation[Any] | None
     """This computation will be disposed when owner is cleaned up."""
-    children: Set[Computation[Any]] = field(default_factory=set)
-    """List of `Computation`s owned by this computation"""
-    name: str | None = None
+    children: Set[Computation[Any]] | None
+    """Set of `Computation`s owned by this computation, allocated on demand."""
+    name: str | None
     """Computation's name used for debugging and graphing"""
-
-    def __post_init__(self) -> None:
-        # add clean up method to list
-        self.cleanups.add(self._remove_computation_from_signal_subscription_list)
+    height: int
+    """Topological rank: strictly larger than the rank of every source `Signal`."""
+    scheduled: int
+    """Epoch of the `ScheduleQueue` in which the computation is queued, -1 if it isn't."""
+    lazy: bool
+    """Lazy memos are only recomputed when their signal is read."""
+    observed: int
+    """Clock at the start of the last execution, 0 if the computation never executed."""
+
+    def __init__(
+        self,
+        function: Callable[[], R] | None,
+        ret: R | None = None,
+        is_memo: bool = False,
+        owner: Computation[Any] | None = None,
+        name: str | None = None,
+        lazy: bool = False,
+    ):
+        self.function = function
+        self.ret = ret
+        self.is_memo = is_memo
+        self.sources = {}
+        self.run = 0
+        self.reads = 0
+        self.cleanups = None
+        self.owner = owner
+        self.children = None
+        self.name = name
+        self.height = 0
+        self.scheduled = -1
+        self.lazy = lazy
+        self.observed = 0
+
+    def add_cleanup(self, function: VoidFunc) -> None:
+        if self.cleanups is None:
+            self.cleanups = []
+        self.cleanups.append(function)
+
+    def add_child(self, child: Computation[Any]) -> None:
+        if self.children is None:
+            self.children = set()
+        self.children.add(child)
 
     def _remove_computation_from_signal_subscription_list(self) -> None:
         for signal in self.sources:
             signal.subscribed_computations.remove(self)
         self.sources.clear()
 
-    def cleanup(self) -> None:
-        # clean up node: execute all clean up functions
-        list(map(lambda func: func(), list(self.cleanups)))
-        # clean up children
-        list(map(lambda child: child.cleanup(), list(self.children)))
-        self.children.clear()
+    def _remove_unread_sources(self) -> None:
+        # Unsubscribe from the sources that were read by a previous execution, but not by
+        # the current one. Subscriptions of sources that are read again are left untouched.
+        if self.reads == len(self.sources):
+            return
+        run = self.run
+        unread = [signal for signal, last_run in self.sources.items() if last_run != run]
+        for signal in unread:
+            del self.sources[signal]
+            signal.subscribed_computations.remove(self)
 
-    def execute(self) -> R:
-        global OWNER
-        global CURRENT_COMPUTATION
+    def cleanup(self, keep_sources: bool = False) -> None:
+        # clean up node: execute all clean up functions, followed by the clean up of the
+        # owned children. Uses an explicit stack, ownership trees can be arbitrarily deep.
+        # With `keep_sources` the node stays subscribed to its own sources, which is used
+        # when it is about to be re-executed.
+        if not keep_sources:
+            # Disposed: unlink from the owner, which may outlive it.
+            owner = self.owner
+            if owner is not None and owner.children is not None:
+                owner.children.discard(self)
+
+        stack: List[Computation[Any]] = [self]
+        while stack:
+            computation = stack.pop()
+            if not keep_sources or computation is not self:
+                computation._remove_computation_from_signal_subscription_list()
+            cleanups = computation.cleanups
+            if cleanups is not None:
+                computation.cleanups = None
+                for func in cleanups:
+                    func()
+            children = computation.children
+            if children is not None:
+                computation.children = None
+                stack.extend(children)
 
-        prev_current_computation = CURRENT_COMPUTATION
-        prev_owner = OWNER
+    def execute(self) -> R:
+        runtime = _current_runtime.get(None) or getRuntime()
+        prev_current_computation = runtime.current_computation
+        prev_owner = runtime.owner
 
         if self.owner is not None:
             # TODO: remove the None
-            self.owner.children.add(self)
+            self.owner.add_child(self)
 
-        self.cleanup()
-        OWNER = CURRENT_COMPUTATION = self
+        self.cleanup(keep_sources=True)
+        self.observed = next(_clock)
+        self.run += 1
+        self.reads = 0
+        runtime.owner = runtime.current_computation = self
 
         try:
             assert self.function is not None
             return self.function()
+        except _Outdated:
+            # Aborted by `_pull`, see there: executed again once the lazy memo is pulled.
+            self.observed = 0
+            if runtime.batch.activated:
+                runtime.batch.schedule(self)
+            raise
         finally:
-            OWNER = prev_owner
-            CURRENT_COMPUTATION = prev_current_computation
+            runtime.owner = prev_owner
+            runtime.current_computation = prev_current_computation
+            self._remove_unread_sources()
+
+    def is_outdated(self) -> bool:
+        """Is `True` if the computation never executed or a source got written since."""
+        observed = self.observed
+        if observed == 0:
+            return True
+        for signal in self.sources:
+            if signal.version > observed:
+                return True
+        return False
+
+    def update(self) -> None:
+        """
+        Brings the computation up-to-date after one of its sources changed. Lazy memos
+        that nobody subscribes to are left outdated until their signal is read.
+        """
+        if not self.is_outdated():
+            # E.g. disposed by its owner, or already executed on demand.
+            return
+        if self.lazy and not cast(Signal[Any], self.ret).subscribed_computations:
+            return
+        self.execute()
 
     def is_root(self) -> bool:
         return self.function is None
 
+    def raise_height(self, height: int) -> None:
+        """
+        Increases the rank of the computation to at least `height` and pushes the new
+        rank downstream. Ranks only ever grow, so this is a no-op for the common case
+        where a computation re-reads the same sources.
+        """
+        stack: List[Tuple[Computation[Any], int]] = [(self, height)]
+        while stack:
+            computation, new_height = stack.pop()
+            if new_height <= computation.height:
+                continue
+            computation.height = new_height
+            if computation.is_memo and computation.ret is not None:
+                signal = cast(Signal[Any], computation.ret)
+                signal.height = new_height
+                for subscriber in signal.subscribed_computations:
+                    stack.append((subscriber, new_height + 1))
+
     def get_parents(self) -> List[INode]:
         return list(self.sources)
 
@@ -103,68 +282,197 @@ class Computation(Generic[R], INode):
         return []
 
 
-class Batch:
+class ScheduleQueue:
+    """
+    Queue of computations ordered by height, in which each computation appears at most once.
+
+    Membership is tracked by stamping the queue's epoch on the computation rather than
+    with a set, so scheduling and membership tests are O(1) without hashing and resetting
+    the queue doesn't require touching its former members.
+    """
 
     def __init__(self) -> None:
+        self.epoch: int = 0
+        self._heap: List[Tuple[int, int, Computation[Any]]] = []
+        self._counter = itertools.count()
+
+    def reset(self) -> None:
+        self.epoch += 1
+        self._heap.clear()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, computation: Computation[Any]) -> bool:
+        return computation.scheduled == self.epoch
+
+    def push(self, computation: Computation[Any]) -> None:
+        if computation.scheduled == self.epoch:
+            # Computation is already scheduled to be executed. Nothing more to do.
+            return
+        computation.scheduled = self.epoch
+        heapq.heappush(self._heap, (computation.height, next(self._counter), computation))
+
+    def discard(self, computation: Computation[Any]) -> None:
+        # The heap entry is left in place and skipped when popped.
+        computation.scheduled = -1
+
+    def pop(self) -> Computation[Any] | None:
+        """Removes and returns the lowest computation, `None` if the queue is empty."""
+        heap = self._heap
+        while heap:
+            height, _, computation = heapq.heappop(heap)
+            if computation.scheduled != self.epoch:
+                # Discarded, e.g. because it got executed on demand.
+                continue
+            if height < computation.height:
+                # Rank got raised after scheduling: move it to its new position.
+                heapq.heappush(heap, (computation.height, next(self._counter), computation))
+                continue
+            computation.scheduled = -1
+            return computation
+        return None
+
+
+class Batch:
+    flush_hooks: List[VoidFunc] = []
+    """
+    Called after every batch of every runtime, once all computations have been executed,
+    in the runtime of the batch.
+    """
+
+    def __init__(self, runtime: Runtime) -> None:
+        self.runtime = runtime
         self.activated: bool = False
-        self.computations: List[Computation[Any]] = []
+        self.flushing: bool = False
+        """Is `True` while the scheduled computations are being executed."""
+        self.computations = ScheduleQueue()
+        self.epoch: int = self.computations.epoch
         self.signals: List[Signal[Any]] = []
+        self.clock: Clock | None = None
+        """In frame mode, schedules the flush of the batch opened by an assign."""
+        self.frame_requested: bool = False
+        """Is `True` while a batch opened by an assign waits for its frame to be flushed."""
+        self._joined = 0
 
     def __enter__(self) -> "Batch":
+        if self.frame_requested:
+            # Joins the batch waiting for its frame.
+            self._joined += 1
+            return self
         if self.activated:
             raise Exception("Batch already activated.")
 
-        self.computations.clear()
+        self.computations.reset()
+        self.epoch = self.computations.epoch
         self.signals.clear()
         self.activated = True
+        if self.runtime.inbox:
+            self.runtime.receive()
         return self
 
-    def __exit__(self, *_: Any) -> None:
-
-        i = 0
-        while len(self.signals) > 0 or len(self.computations) > 0:
-            print("Executing step:", i)
-            for s in self.signals:
-                print("setting", s)
-                s._value = s._pending_value
-                s._pending_value = None
-                s.state = State.CLEAN
-
-            self.signals.clear()
-
-            computation_snapshot = list(self.computations)
-            self.computations.clear()
-
-            for c in computation_snapshot:
-                c.execute()
-
-            i += 1
-            if i > 1_000_000:
-                print("Assume run-away computation...")
-
-        self.activated = False
+    def schedule(self, computation: Computation[Any]) -> None:
+        self.computations.push(computation)
+
+    def request_frame(self) -> None:
+        """Opens a batch, which is flushed when the clock calls back."""
+        assert self.clock is not None
+        self.__enter__()
+        self.frame_requested = True
+        self.clock(self.flush_frame)
+
+    def flush_frame(self) -> None:
+        """Flushes the batch waiting for its frame, if any."""
+        if not self.frame_requested:
+            return
+        if _trace.enabled:
+            _trace.debug("flush frame", signals=len(self.signals))
+        self.frame_requested = False
+        self.__exit__()
+
+    def run(self, computation: Computation[Any]) -> None:
+        """Executes a scheduled computation ahead of its turn in the queue."""
+        self.computations.discard(computation)
+        if computation.is_outdated():
+            computation.execute()
+
+    def _commit_signals(self) -> None:
+        for s in self.signals:
+            if _trace.enabled:
+                _trace.debug("commit", signal=s)
+            s._value = s._pending_value
+            s._pending_value = None
+            s.version = next(_clock)
+            s.queued = -1
 
+        self.signals.clear()
 
-class State(Enum):
-    CLEAN = "clean"
-    PENDING = "pending"
-    """New value has been computed but not set"""
-    STALE = "stale"
-    """Sources have changed but pending value has not been set"""
+    def __exit__(self, *_: Any) -> None:
+        if self._joined:
+            self._joined -= 1
+            return
+
+        # Computations are executed in order of increasing height. A computation only
+        # runs after every computation it (transitively) depends on, so each one runs
+        # at most once per batch and never observes an outdated memo.
+        if self.runtime.inbox:
+            self.runtime.receive()
+        self.flushing = True
+        try:
+            i = 0
+            while len(self.signals) > 0 or len(self.computations) > 0:
+                self._commit_signals()
+                computation = self.computations.pop()
+                if computation is None:
+                    break
+
+                if _trace.enabled:
+                    _trace.debug("execute", step=i, computation=computation.name)
+                computation.update()
+
+                i += 1
+                if i == 1_000_000:
+                    warnings.warn("Assume run-away computation...", RuntimeWarning)
+        finally:
+            self.flushing = False
+            self.activated = False
+            for hook in self.flush_hooks:
+                hook()
 
 
 class Signal(Generic[T], INode):
+    __slots__ = ("_value", "_pending_value", "_readonly", "_equals", "subscribed_computations",
+                 "computation", "version", "height", "queued", "runtime")
 
-    def __init__(self, value: T | None, readonly: bool = False):
+    def __init__(self, value: T | None, readonly: bool = False, equals: Equals = True):
         self._value: T | None = value
         self._pending_value: T | None = None
         self._readonly: bool = readonly
         """If `True`, trying to assign a new value will raise an Exception."""
-        self.subscribed_computations: Set[Computation[Any]] = set()
+        self._equals: Callable[[Any, Any], bool] | None
+        """Assignments of a value equal to the current one are ignored, `None` never ignores."""
+        if equals is True:
+            self._equals = _equal
+        elif equals is False:
+            self._equals = None
+        else:
+            self._equals = equals
+        self.subscribed_computations: Set[Computation[Any]] = _NO_SUBSCRIBERS
         """Set of computations that depend on signal. This set will be re-executed on signal changes."""
         self.computation: Computation[Signal[T]] | None = None
         """When Signal was created by a memo"""
-        self.state: State = State.CLEAN
+        self.version: int = 0
+        """Clock at the last write of the signal's value."""
+        self.height: int = 0
+        """Topological rank: equal to the rank of the memo computation that creates it."""
+        self.queued: int = -1
+        """Epoch of the batch in which the signal has a pending value, -1 if it has none."""
+        self.runtime = getRuntime()
+        """Runtime in which the signal was created, all its assignments are made in it."""
+
+    def is_pending(self) -> bool:
+        """Is `True` if a new value has been assigned in the active batch but not set."""
+        return self.queued == self.runtime.batch.epoch
 
     def assign(self, new_value: T) -> Signal[T]:
         if self._readonly:
@@ -172,57 +480,53 @@ class Signal(Generic[T], INode):
                 "Not allowed to assign new value to readonly Signal."
                 "Did you create this signal using 'createMemo'? That would not be allowed.")
 
-        if (batch.activated and self.state == State.PENDING and (self._pending_value != new_value)):
+        runtime = self.runtime
+        if _current_runtime.get(None) is not runtime:
+            # Assigned from another thread or runtime: hand the value over.
+            runtime.post(self, new_value)
+            return self
+
+        batch = runtime.batch
+        # Assignments coalesced in a frame are allowed to overwrite each other.
+        if (batch.activated and self.queued == batch.epoch and not batch.frame_requested
+                and not _equal(self._pending_value, new_value)):
             raise Exception("Not allowed to assign another value during batching: "
                             f"{self._pending_value} (PENDING) !=  {new_value}")
 
         return self._assign(new_value)
 
     def _assign(self, new_value: T) -> Signal[T]:
-        # *Not* is batch mode. Logic is fairly simple:
-        # (1) Set new value
-        # (2) Run through dependency graph and re-execute all computations
-        # self._value = new_value
-        # for el in self.get_topo():
-        #     if isinstance(el, Computation):
-        #         el.execute()
-        # return self
+        batch = self.runtime.batch
+        equals = self._equals
+        if equals is not None and self.queued != batch.epoch and equals(self._value, new_value):
+            # Unchanged value: subscribed computations, and thereby everything downstream
+            # of them, don't need to be notified.
+            return self
 
         activated_batch = False
         if not batch.activated:
-            activated_batch = True
-            batch.__enter__()
-
-        self._pending_value = new_value
-        self.state = State.PENDING
-        batch.signals.append(self)
-
-        for el in self.get_topo():
-            if el == self:
-                continue
-
-            if isinstance(el, Signal) and el.is_created_by_memo():
-                # There is a signal in the dependency graph created by a
-                # memo.  The signal's value will only be updated once the
-                # corresponding computation has ran. For now, simply set the
-                # signal's state to `STALE`, so that depending computations
-                # know their sources are outdated (state).
-                el.state = State.STALE
-
-            if isinstance(el, Computation):
-                computation = el
-
-                if computation in batch.computations:
-                    # Computation is already scheduled to be executed. Nothing more to do.
-                    continue
-
-                if any(s.state == State.STALE for s in computation.sources):
-                    # Don't schedule the computation because at least one of
-                    # it sources is stale. The computation will be scheduled
-                    # for execution once the stale signal is updated.
-                    continue
-
-                batch.computations.append(computation)
+            if batch.clock is not None:
+                batch.request_frame()
+            else:
+                activated_batch = True
+                batch.__enter__()
+
+        if batch.flushing or self.computation is not None:
+            # Value written by a running computation. Computations are executed in
+            # topological order, so none of the subscribers have observed the old value
+            # in this batch yet and it is safe to set the value directly.
+            self._value = new_value
+            self.version = next(_clock)
+        else:
+            self._pending_value = new_value
+            if self.queued != batch.epoch:
+                self.queued = batch.epoch
+                batch.signals.append(self)
+
+        # Only the direct subscribers are scheduled, they will in turn schedule their
+        # own subscribers once executed. The batch orders them by height.
+        for computation in self.subscribed_computations:
+            batch.schedule(computation)
 
         if activated_batch:
             batch.__exit__()
@@ -233,28 +537,59 @@ class Signal(Generic[T], INode):
         visited: Set[INode] = set()  # Set to keep track of visited nodes
         topo: List[INode] = []
 
-        def build_topo(node: INode) -> None:
-            if node not in visited:
-                visited.add(node)
-                for child in node.get_children():
-                    build_topo(child)
+        # Iterative depth-first search: a node is added to `topo` once all its children
+        # have been added, the second item of the tuple marks this post-visit.
+        stack: List[Tuple[INode, bool]] = [(self, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
                 topo.append(node)
+                continue
+            if node in visited:
+                continue
+            visited.add(node)
+            stack.append((node, True))
+            for child in node.get_children():
+                if child not in visited:
+                    stack.append((child, False))
 
-        build_topo(self)
         return list(reversed(topo))
 
     def __call__(self) -> T | None:
-        if OWNER is not None:
-            self.subscribed_computations.add(OWNER)
-            OWNER.sources.add(self)
+        runtime = _current_runtime.get(None) or getRuntime()
+        computation = self.computation
+        if computation is not None:
+            batch = runtime.batch
+            # Reading a memo that is due to be recomputed: bring it up-to-date first.
+            if batch.flushing and computation in batch.computations:
+                batch.run(computation)
+            elif computation.lazy and computation.is_outdated():
+                _pull(runtime, computation)
+
+        owner = runtime.current_computation
+        if owner is not None and owner.function is not None:
+            # Root computations own computations, but don't track signals.
+            sources = owner.sources
+            last_run = sources.get(self)
+            if last_run != owner.run:
+                # First read in this execution of the owner.
+                if last_run is None:
+                    subscribers = self.subscribed_computations
+                    if subscribers is _NO_SUBSCRIBERS:
+                        subscribers = self.subscribed_computations = set()
+                    subscribers.add(owner)
+                    if self.height >= owner.height:
+                        owner.raise_height(self.height + 1)
+                sources[self] = owner.run
+                owner.reads += 1
         return self._value
 
     def __str__(self) -> str:
-        return "Signal(value={}, pending={}, readonly={}, state={}, number_subs={})".format(
+        return "Signal(value={}, pending={}, readonly={}, version={}, number_subs={})".format(
             self._value,
             self._pending_value,
             self._readonly,
-            self.state,
+            self.version,
             len(self.subscribed_computations),
         )
 
@@ -270,11 +605,144 @@ class Signal(Generic[T], INode):
         return []
 
 
-# Globals:
-batch = Batch()
-OWNER: Computation[Any] | None = None
-CURRENT_COMPUTATION: Computation[Any] | None = None
-ROOT: Computation[Any] = Computation(None)
+class _Outdated(BaseException):
+    """Aborts the execution of a lazy memo that read an outdated lazy memo, see `_pull`."""
+
+    def __init__(self, computation: Computation[Any]):
+        self.computation = computation
+
+
+def _pull(runtime: Runtime, computation: Computation[Any]) -> None:
+    # Executes an outdated lazy memo on read. A lazy memo reading another outdated lazy
+    # memo is aborted, and executed again once the latter is up-to-date: the executions
+    # form an explicit stack, so long chains of lazy memos don't exhaust the call stack.
+    # The sources of a memo that never executed aren't known upfront, hence the abort.
+    # Every computation it unwinds, e.g. an eager memo run ahead of its turn in the batch,
+    # is marked outdated and scheduled again (see `Computation.execute`).
+    if runtime.pulling:
+        raise _Outdated(computation)
+    runtime.pulling = True
+    stack = [computation]
+    try:
+        while stack:
+            try:
+                stack[-1].execute()
+            except _Outdated as outdated:
+                stack.append(outdated.computation)
+            else:
+                stack.pop()
+    finally:
+        runtime.pulling = False
+
+
+class Runtime:
+    """
+    State of the reactive runtime: its batch and the computation being executed.
+
+    The runtime in use is bound to a context variable, so every thread, which starts with
+    an empty context, gets its own runtime, and `run` executes a function in a given
+    runtime. Signals belong to the runtime in which they are created. Assigning a signal
+    from another runtime posts the value to the signal's runtime, which assigns it in its
+    next batch, when `drain` is called, or when `wakeup` calls back.
+    """
+
+    __slots__ = ("batch", "owner", "current_computation", "lock", "inbox", "wakeup", "pumped",
+                 "pulling", "building")
+
+    def __init__(self) -> None:
+        self.batch = Batch(self)
+        self.owner: Computation[Any] | None = None
+        """Owns the computations created now."""
+        self.current_computation: Computation[Any] | None = None
+        """Tracks the signals read now."""
+        self.lock = threading.Lock()
+        """Protects `inbox`."""
+        self.inbox: List[Tuple[Signal[Any], Any]] = []
+        """Assignments posted by other runtimes."""
+        self.wakeup: Clock | None = None
+        """
+        Asked to call back when the inbox receives a first assignment, in the thread of the
+        runtime, e.g. the `call_soon_threadsafe` method of its event loop.
+        """
+        self.pumped: Dict[Signal[Any], Any] = {}
+        """Latest values of the iterators pumped into signals, waiting to be assigned."""
+        self.pulling = False
+        """Is `True` while outdated lazy memos are executed on read, see `_pull`."""
+        self.building: List[Any] = []
+        """Frames of the components being built, innermost last, see `fluid.components`."""
+
+    def run(self, function: Callable[[], R]) -> R:
+        """Executes `function` in this runtime, in a copy of the current context."""
+        return contextvars.copy_context().run(self._run, function)
+
+    def _run(self, function: Callable[[], R]) -> R:
+        _current_runtime.set(self)
+        return function()
+
+    def post(self, signal: Signal[T], value: T) -> None:
+        """Queues the assignment of `value` to `signal`, safe to call from any thread."""
+        with self.lock:
+            self.inbox.append((signal, value))
+            first = len(self.inbox) == 1
+        if first and self.wakeup is not None:
+            # The callback may run in the context of the posting thread.
+            self.wakeup(lambda: self.run(self.drain))
+
+    def drain(self) -> None:
+        """Assigns the posted values, in a single batch. Must run in this runtime."""
+        if not self.inbox:
+            return
+        if self.batch.activated:
+            self.receive()
+        else:
+            with self.batch:
+                pass  # entering the batch receives the posted values
+
+    def receive(self) -> None:
+        # Later posts of a signal overwrite earlier ones within the batch.
+        with self.lock:
+            inbox = self.inbox
+            self.inbox = []
+        for signal, value in inbox:
+            signal._assign(value)
+
+
+_current_runtime: contextvars.ContextVar[Runtime] = contextvars.ContextVar("fluid_runtime")
+
+
+def getRuntime() -> Runtime:
+    """Returns the runtime of the current context, created on first use."""
+    runtime = _current_runtime.get(None)
+    if runtime is None:
+        runtime = Runtime()
+        _current_runtime.set(runtime)
+    return runtime
+
+
+def getOwner() -> Computation[Any] | None:
+    """Returns the computation owning the computations created now, if any."""
+    return getRuntime().owner
+
+
+class _CurrentBatch:
+    """The `Batch` of the current runtime, e.g. `with batch:` batches the assignments in it."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(getRuntime().batch, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(getRuntime().batch, name, value)
+
+    def __enter__(self) -> Batch:
+        return getRuntime().batch.__enter__()
+
+    def __exit__(self, *args: Any) -> None:
+        getRuntime().batch.__exit__(*args)
+
+
+batch = cast(Batch, _CurrentBatch())
 
 
 @doublewrap
@@ -283,20 +751,38 @@ def createEffect(function: Callable[[], R], name: str | None = None) -> R | None
 
 
 @doublewrap
-def createMemo(function: Callable[[], R], name: str | None = None) -> Signal[R]:
-    signal = Signal[R](None, readonly=True)
-    computation = _createComputation(lambda: signal._assign(function()), name="memo")
-    computation.is_memo = True
-    # link computation to signal
+def createMemo(function: Callable[[], R],
+               name: str | None = None,
+               equals: Equals = True,
+               lazy: bool = False) -> Signal[R]:
+    """
+    Creates a readonly `Signal` holding the return value of `function`, which is
+    recomputed whenever the signals read by `function` change. Recomputations for which
+    `equals(old, new)` holds don't notify the memo's subscribers.
+
+    A `lazy` memo doesn't compute its value upfront. As long as no computation
+    subscribes to it, changes of its sources only mark it outdated and the value is
+    recomputed on the next read.
+    """
+    signal = Signal[R](None, readonly=True, equals=equals)
+    computation = Computation(lambda: signal._assign(function()),
+                              ret=signal,
+                              is_memo=True,
+                              owner=signal.runtime.owner,
+                              name=name or "memo",
+                              lazy=lazy)
+    # link computation to signal before the first execution, such that the rank of the
+    # computation is propagated to the signal.
     signal.computation = computation
+    if not lazy:
+        computation.execute()
     return signal
 
 
 def _createComputation(function: Callable[[], R], name: str | None) -> Computation[R]:
-    global OWNER
-    owner = OWNER
+    owner = getRuntime().owner
 
-    if OWNER is None:
+    if owner is None:
         # TODO: raise warning
         # raise Exception("Effects can not be created when owner is None")
         pass
@@ -307,11 +793,295 @@ def _createComputation(function: Callable[[], R], name: str | None) -> Computati
     return computation
 
 
-def createRoot(function: Callable[[], R]) -> R | None:
-    return createEffect(function)
+def setFrameScheduler(clock: Clock | None) -> None:
+    """
+    Opts in to coalescing assignments made outside of a `with batch:`. The first one
+    opens a batch and asks `clock` to call back, all assignments until then join that
+    batch and are propagated at once in the callback. Signals keep their old value until
+    then, and a later assignment overwrites an earlier one. `None` restores synchronous
+    propagation.
+    """
+    batch = getRuntime().batch
+    batch.flush_frame()
+    batch.clock = clock
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.get_event_loop()
+
+
+def microtask(callback: VoidFunc) -> None:
+    """Clock calling back as soon as control returns to the asyncio event loop."""
+    _event_loop().call_soon(callback)
+
+
+class ManualClock:
+    """Clock calling back when `tick` is called, e.g. in tests or headless rendering."""
+
+    def __init__(self) -> None:
+        self.callbacks: List[VoidFunc] = []
+
+    def __call__(self, callback: VoidFunc) -> None:
+        self.callbacks.append(callback)
+
+    def tick(self) -> None:
+        callbacks = self.callbacks
+        self.callbacks = []
+        for callback in callbacks:
+            callback()
+
+
+def createRoot(function: Callable[[VoidFunc], R], name: str | None = None) -> R:
+    """
+    Executes `function(dispose)` under a new root computation, which owns the
+    computations created by `function` until `dispose` is called. Unlike an effect, the
+    root doesn't track the signals read by `function`, and it isn't disposed together
+    with the current owner.
+    """
+    root: Computation[Any] = Computation(None, name=name or "root")
+    if _live_roots is not None:
+        _live_roots.add(root)
+
+    def dispose() -> None:
+        root.cleanup()
+        if _live_roots is not None:
+            _live_roots.discard(root)
+
+    return runWithOwner(root, lambda: function(dispose))
+
+
+class RootStats(NamedTuple):
+    name: str
+    computations: int
+    """Number of live computations owned by the root, transitively."""
+    signals: int
+    """Number of distinct signals read by, or created as memos of, these computations."""
+
+
+_live_roots: Set[Computation[Any]] | None = set() if os.getenv("FLUID_DEBUG_ROOTS") else None
+"""Roots created by `createRoot` and not yet disposed, when tracked by `trackRoots`."""
+
+
+def trackRoots(enabled: bool = True) -> None:
+    """
+    Debug mode keeping track of the roots created by `createRoot` from now on, so that
+    `getRootStats` can report them. Also enabled by the `FLUID_DEBUG_ROOTS` environment
+    variable.
+    """
+    global _live_roots
+    _live_roots = set() if enabled else None
+
+
+def getRootStats() -> List[RootStats]:
+    """
+    Counts the live computations and signals of every tracked root. Counts growing over
+    time, or roots that are never disposed, reveal leaks.
+    """
+    stats = []
+    for root in _live_roots or ():
+        computations = 0
+        signals: Set[Signal[Any]] = set()
+        stack: List[Computation[Any]] = list(root.children or ())
+        while stack:
+            computation = stack.pop()
+            computations += 1
+            signals.update(computation.sources)
+            if computation.is_memo:
+                signals.add(cast(Signal[Any], computation.ret))
+            stack.extend(computation.children or ())
+        stats.append(RootStats(root.name or "root", computations, len(signals)))
+    return stats
 
 
 def cleanUp(function: VoidFunc) -> None:
-    if CURRENT_COMPUTATION is None:
+    computation = getRuntime().current_computation
+    if computation is None:
         raise Exception("cleanUp's can only be added to computations")
-    CURRENT_COMPUTATION.cleanups.add(function)
+    computation.add_cleanup(function)
+
+
+def runWithOwner(owner: Computation[Any] | None, function: Callable[[], R]) -> R:
+    """Executes `function` with `owner` owning the computations created by it."""
+    runtime = getRuntime()
+    prev_current_computation = runtime.current_computation
+    prev_owner = runtime.owner
+    runtime.owner = runtime.current_computation = owner
+    try:
+        return function()
+    finally:
+        runtime.owner = prev_owner
+        runtime.current_computation = prev_current_computation
+
+
+_Mapped = Tuple[Computation[Any], T, U]
+"""Item mapped by `mapArray`: the root owning its computations, the item and its value."""
+
+
+def _mapItem(map_fn: Callable[[T], U], item: T,
+             reusable: List[_Mapped[T, U]] | None) -> _Mapped[T, U]:
+    # Reuses the first mapped item with the same key, unless its content changed.
+    if reusable:
+        entry = reusable.pop(0)
+        if entry[1] is item or entry[1] == item:
+            return entry
+        # Same key, new content: the mapped value is stale.
+        entry[0].cleanup()
+    root: Computation[Any] = Computation(None, name="item")
+    return root, item, runWithOwner(root, lambda: map_fn(item))
+
+
+def mapArray(each: Callable[[], Sequence[T] | None],
+             map_fn: Callable[[T], U],
+             key: Callable[[T], Hashable] | None = None) -> Signal[List[U]]:
+    """
+    Maps the items of the list returned by `each` with `map_fn`, keyed by `key(item)`
+    (by default the item itself).
+
+    `map_fn` only runs for new items: an item whose key was already present reuses its
+    mapped value, unless the item changed (it is neither identical nor `==` to the
+    previous item with that key), in which case it is mapped again. Every item is mapped
+    under its own root computation, which owns the computations created by `map_fn` and
+    is disposed when the item is removed or mapped again, or when the owner of `mapArray`
+    is cleaned up.
+    """
+    key_fn: Callable[[T], Hashable] = key or (lambda item: cast(Hashable, item))
+    # Mapped items by key, a list to support duplicate keys.
+    mapped: Dict[Hashable, List[_Mapped[T, U]]] = {}
+
+    def _dispose_all() -> None:
+        for entries in mapped.values():
+            for root, _, _ in entries:
+                root.cleanup()
+        mapped.clear()
+
+    if getRuntime().current_computation is not None:
+        cleanUp(_dispose_all)
+
+    def _update() -> List[U]:
+        previous = dict(mapped)
+        mapped.clear()
+        result: List[U] = []
+        for item in each() or []:
+            k = key_fn(item)
+            entry = _mapItem(map_fn, item, previous.get(k))
+            mapped.setdefault(k, []).append(entry)
+            result.append(entry[2])
+
+        for entries in previous.values():
+            for root, _, _ in entries:
+                root.cleanup()
+        return result
+
+    return createMemo(_update, name="mapArray")
+
+
+class Resource(Generic[T]):
+    """
+    Value of an async fetcher, created by `createResource`. Calling the resource reads
+    its latest value; `loading` and `error` are signals holding its state.
+    """
+
+    __slots__ = ("value", "loading", "error", "_refetch")
+
+    def __init__(self, value: T | None):
+        self.value = Signal[T](value)
+        self.loading = Signal[bool](False)
+        """Is `True` while a fetch is running."""
+        self.error = Signal[Union[BaseException, None]](None)
+        """Exception raised by the last fetch, `None` if it succeeded."""
+        self._refetch = Signal[int](0, equals=False)
+
+    def __call__(self) -> T | None:
+        return self.value()
+
+    def refetch(self) -> None:
+        """Fetches again with the current value of the source."""
+        self._refetch.assign(0)
+
+
+def createResource(source: Callable[[], U | None],
+                   fetcher: Callable[[U], Awaitable[T]],
+                   initial_value: T | None = None,
+                   name: str | None = None) -> Resource[T]:
+    """
+    Creates a `Resource` holding the result of `fetcher(source())`, awaited as a task on
+    the asyncio event loop. Whenever the signals read by `source` change, the running
+    fetch is cancelled, as its result would be stale, and a new one is started. While the
+    source is `None` or `False`, nothing is fetched.
+    """
+    resource = Resource[T](initial_value)
+    batch = resource.value.runtime.batch
+
+    async def _fetch(awaitable: Awaitable[T]) -> None:
+        try:
+            value = await awaitable
+        except asyncio.CancelledError:
+            raise
+        except Exception as exception:
+            with batch:
+                resource.error.assign(exception)
+                resource.loading.assign(False)
+            return
+
+        with batch:
+            resource.value.assign(value)
+            resource.error.assign(None)
+            resource.loading.assign(False)
+
+    def _load() -> None:
+        resource._refetch()
+        value = source()
+        if value is None or value is False:
+            resource.loading.assign(False)
+            return
+
+        resource.loading.assign(True)
+        task = _event_loop().create_task(_fetch(fetcher(value)))
+
+        def _cancel() -> None:
+            task.cancel()
+
+        # Runs when the source changes, as well as when the resource is disposed.
+        cleanUp(_cancel)
+
+    createEffect(_load, name=name or "resource")
+    return resource
+
+
+def _flush_pumped() -> None:
+    runtime = getRuntime()
+    pumped = list(runtime.pumped.items())
+    runtime.pumped.clear()
+    with runtime.batch:
+        for signal, value in pumped:
+            signal.assign(value)
+
+
+def fromAsyncIterator(iterator: AsyncIterator[T], initial_value: T | None = None) -> Signal[T]:
+    """
+    Returns a `Signal` holding the latest value produced by `iterator`, which is consumed
+    by a task on the asyncio event loop. Bursts of values are coalesced: values produced
+    before control returns to the event loop, by any pumped iterator, are assigned in a
+    single batch, and only the last value of every signal is kept. The task is cancelled
+    when the current computation is cleaned up.
+    """
+    signal = Signal[T](initial_value)
+    pumped = signal.runtime.pumped
+
+    async def _pump() -> None:
+        async for value in iterator:
+            if not pumped:
+                microtask(_flush_pumped)
+            pumped[signal] = value
+
+    task = _event_loop().create_task(_pump())
+
+    def _cancel() -> None:
+        task.cancel()
+
+    if signal.runtime.current_computation is not None:
+        cleanUp(_cancel)
+    return signal
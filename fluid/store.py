@@ -0,0 +1,284 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Stores: nested dicts and lists with a signal per property. Reading a property through the
+store proxy tracks that property only, so a change to one leaf notifies only the
+computations which read that leaf.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+from fluid.signal import Signal, batch
+
+__all__ = ["createStore", "reconcile", "StoreProxy", "SetStore"]
+
+Container = Union[Dict[Any, Any], List[Any]]
+
+SetStore = Callable[..., None]
+"""Updates a store: `setStore(*path, value)`, see `createStore`."""
+
+_MISSING = object()
+
+
+def _is_container(value: Any) -> bool:
+    return isinstance(value, (dict, list))
+
+
+def _same(old: Any, new: Any) -> bool:
+    # Containers are updated in place: only a different container is a change.
+    if _is_container(old) or _is_container(new):
+        return old is new
+    return bool(old == new)
+
+
+class _Node:
+    """Signals of the properties of a container in the store, created on first read."""
+
+    __slots__ = ("store", "target", "signals", "shape", "proxy")
+
+    def __init__(self, store: _Store, target: Container):
+        self.store = store
+        self.target = target
+        self.signals: Dict[Any, Signal[Any]] = {}
+        self.shape: Signal[int] | None = None
+        """Notifies the computations iterating the container when keys are added or removed."""
+        self.proxy = StoreProxy(self)
+
+    def read(self, key: Any) -> Any:
+        if isinstance(self.target, list) and key < 0:
+            # The element read depends on the length of the list.
+            self.track_shape()
+            key += len(self.target)
+        signal = self.signals.get(key)
+        if signal is None:
+            signal = self.signals[key] = Signal(self.target[key], equals=_same)
+        value: Any = signal()
+        return self.store.wrap(value) if _is_container(value) else value
+
+    def track_shape(self) -> None:
+        if self.shape is None:
+            self.shape = Signal(0, equals=False)
+        self.shape()
+
+    def _changed(self, key: Any, old: Any, value: Any) -> None:
+        if (old is _MISSING or value is _MISSING) and self.shape is not None:
+            self.shape.assign(0)
+        if _is_container(old):
+            self.store.forget(old)
+        signal = self.signals.get(key)
+        if signal is not None:
+            if value is _MISSING:
+                del self.signals[key]
+                value = None
+            signal.assign(value)
+
+    def set(self, key: Any, value: Any) -> None:
+        """Sets `key`, which may be new, notifying its readers if the value changed."""
+        target = self.target
+        if isinstance(target, list):
+            if key == len(target):
+                target.append(value)
+                self._changed(key, _MISSING, value)
+                return
+            old = target[key]
+        else:
+            old = target.get(key, _MISSING)
+
+        if old is not _MISSING and _same(old, value):
+            return
+        target[key] = value
+        self._changed(key, old, value)
+
+    def delete(self, key: Any) -> None:
+        """Deletes `key` of a dict, or the last element of a list."""
+        target = self.target
+        old = target[key]
+        if isinstance(target, list):
+            assert key == len(target) - 1, "only the last element of a list can be deleted"
+            target.pop()
+        else:
+            del target[key]
+        self._changed(key, old, _MISSING)
+
+
+class _Store:
+
+    def __init__(self) -> None:
+        self.nodes: Dict[int, _Node] = {}
+        """Nodes by `id` of their container. A node keeps its container alive."""
+
+    def node(self, target: Container) -> _Node:
+        node = self.nodes.get(id(target))
+        if node is None:
+            node = self.nodes[id(target)] = _Node(self, target)
+        return node
+
+    def wrap(self, target: Container) -> StoreProxy:
+        return self.node(target).proxy
+
+    def forget(self, target: Container) -> None:
+        # The container got removed from the store, together with its descendants.
+        stack = [target]
+        while stack:
+            container = stack.pop()
+            self.nodes.pop(id(container), None)
+            values = container.values() if isinstance(container, dict) else container
+            stack.extend(value for value in values if _is_container(value))
+
+
+class StoreProxy:
+    """
+    Read-only view on a dict or list of a store. Reading a property, e.g. `store["key"]`,
+    tracks that property, nested dicts and lists are returned as proxies. Iterating, or
+    taking the length, tracks the keys of the container.
+    """
+
+    __slots__ = ("_node", )
+
+    def __init__(self, node: _Node):
+        self._node = node
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._node.read(key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def __contains__(self, key: Any) -> bool:
+        node = self._node
+        node.track_shape()
+        if isinstance(node.target, list):
+            return isinstance(key, int) and -len(node.target) <= key < len(node.target)
+        return key in node.target
+
+    def __len__(self) -> int:
+        self._node.track_shape()
+        return len(self._node.target)
+
+    def __iter__(self) -> Iterator[Any]:
+        node = self._node
+        node.track_shape()
+        if isinstance(node.target, list):
+            return (node.read(i) for i in range(len(node.target)))
+        return iter(list(node.target))
+
+    def keys(self) -> List[Any]:
+        return list(self)
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self]
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        return [(key, self[key]) for key in self]
+
+    def unwrap(self) -> Container:
+        """The underlying dict or list, without tracking. Not to be modified."""
+        return self._node.target
+
+    def __repr__(self) -> str:
+        return f"StoreProxy({self._node.target!r})"
+
+
+class _Reconcile:
+    __slots__ = ("value", )
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def reconcile(value: Any) -> Any:
+    """
+    Marks `value` to be diffed against the current value by `setStore`, instead of
+    replacing it: containers are kept and updated key by key, so only the leaves that
+    actually differ notify their readers.
+    """
+    return _Reconcile(value)
+
+
+def _reconcile(node: _Node, value: Container) -> None:
+    target = node.target
+    store = node.store
+    if isinstance(target, dict):
+        assert isinstance(value, dict)
+        for key in [key for key in target if key not in value]:
+            node.delete(key)
+        keys: Any = value.keys()
+    else:
+        assert isinstance(value, list)
+        while len(target) > len(value):
+            node.delete(len(target) - 1)
+        keys = range(len(value))
+
+    for key in keys:
+        new = value[key]
+        if isinstance(target, dict):
+            old = target.get(key, _MISSING)
+        else:
+            old = target[key] if key < len(target) else _MISSING
+        if (isinstance(old, dict) and isinstance(new, dict)
+                or isinstance(old, list) and isinstance(new, list)):
+            _reconcile(store.node(old), new)
+        else:
+            node.set(key, new)
+
+
+def createStore(value: Container) -> Tuple[StoreProxy, SetStore]:
+    """
+    Creates a store holding `value`, a dict or list which may nest other dicts and lists.
+    Returns a `StoreProxy` to read the store and a function to update it:
+
+    - `setStore(*path, value)` sets the property at the end of the path of keys and
+      indices, e.g. `setStore("user", "name", "Joe")`. A function is called with the
+      current value to compute the new one. Setting the index equal to the length of a
+      list appends to it.
+    - `setStore(*path, reconcile(value))` diffs `value` against the current value.
+    - With an empty path, the keys of the dict `value` are set on the root dict.
+
+    A store owns its data: it must only be updated with `setStore`. All updates of a call
+    are made in a single batch.
+    """
+    store = _Store()
+    root = store.node(value)
+
+    def setStore(*args: Any) -> None:
+        if not args:
+            raise TypeError("setStore requires a value")
+        *path, new = args
+        if batch.activated:
+            _set(root, path, new)
+        else:
+            with batch:
+                _set(root, path, new)
+
+    return root.proxy, setStore
+
+
+def _set(root: _Node, path: List[Any], value: Any) -> None:
+    node = root
+    if path:
+        for key in path[:-1]:
+            node = node.store.node(node.target[key])
+        key = path[-1]
+        if callable(value):
+            value = value(node.target[key])
+        if isinstance(value, _Reconcile):
+            current = node.target[key]
+            if _is_container(current) and type(current) is type(value.value):
+                _reconcile(node.store.node(current), value.value)
+                return
+            value = value.value
+        node.set(key, value)
+        return
+
+    if callable(value):
+        value = value(root.target)
+    if isinstance(value, _Reconcile):
+        _reconcile(root, value.value)
+        return
+    assert isinstance(root.target, dict) and isinstance(value, dict), \
+        "only the keys of a dict can be set at the root of a store"
+    for key, item in value.items():
+        root.set(key, item)
@@ -1,9 +1,10 @@
 # Copyright 2022 (c) Vincent Dutordoir
 # SPDX-License-Identifier: Apache-2.0
+from bisect import bisect_left
 from functools import wraps
-from typing import Any, Callable, TypeVar, cast
+from typing import Any, Callable, List, Sequence, TypeVar, cast
 
-__all__ = ["doublewrap"]
+__all__ = ["doublewrap", "longest_increasing_subsequence"]
 
 F = TypeVar('F', bound=Callable[..., Any])
 
@@ -21,17 +22,51 @@ def doublewrap(decorator: F) -> F:
     @decorator
     def foo():
         ...
+    ```
+    or as a plain function call `decorator(foo, with, arguments, and=kwargs)`.
 
     From: https://stackoverflow.com/a/14412901
     """
 
     @wraps(decorator)
     def new_dec(*args, **kwargs):  # type: ignore
-        if len(args) == 1 and len(kwargs) == 0 and callable(args[0]):
+        if len(args) >= 1 and callable(args[0]):
             # actual decorated function
-            return decorator(args[0])
+            return decorator(*args, **kwargs)
         else:
             # decorator arguments
             return lambda realf: decorator(realf, *args, **kwargs)
 
     return cast(F, new_dec)
+
+
+def longest_increasing_subsequence(values: Sequence[int]) -> List[int]:
+    """
+    Returns the positions of a longest strictly increasing subsequence of `values`,
+    ignoring negative values, in O(n log n).
+
+    Used to find the largest set of nodes that can stay in place when reordering.
+    """
+    tails: List[int] = []  # tails[k]: position ending the best subsequence of length k + 1
+    tail_values: List[int] = []
+    previous: List[int] = [-1] * len(values)
+
+    for i, value in enumerate(values):
+        if value < 0:
+            continue
+        k = bisect_left(tail_values, value)
+        if k > 0:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    positions: List[int] = []
+    i = tails[-1] if tails else -1
+    while i >= 0:
+        positions.append(i)
+        i = previous[i]
+    return positions[::-1]
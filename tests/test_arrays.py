@@ -0,0 +1,61 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+from array import array
+
+from fluid.arrays import ArraySignal, createArrayFilter, createArrayMap, createArraySum
+from fluid.signal import batch, createEffect
+
+
+def test_element_updates_are_incremental():
+    values = ArraySignal(array("d", range(100_000)))
+    calls = []
+
+    def double(x):
+        calls.append(x)
+        return 2 * x
+
+    doubled = createArrayMap(values, double, typecode="d")
+    total = createArraySum(doubled)
+    seen = []
+    createEffect(lambda: seen.append(total()))
+    calls.clear()
+
+    values.set(10, 1_000.0)
+    assert calls == [1_000.0]
+    assert seen == [2 * sum(range(100_000)), 2 * sum(range(100_000)) + 2 * (1_000 - 10)]
+
+    with batch:
+        values.set(1, -1.0)
+        values.set(2, -2.0)
+        values.set(1, -3.0)
+        # Updates are applied when the batch ends.
+        assert values()[1] == 1.0
+    assert len(calls) == 3
+    assert doubled()[1:3] == array("d", [-6.0, -4.0])
+    assert total() == 2 * sum(values())
+    assert len(seen) == 3
+
+
+def test_replacement_recomputes():
+    values = ArraySignal([1, 2, 3])
+    total = createArraySum(values)
+    values.assign([4, 5])
+    assert total() == 9
+    values.update({0: 10, 1: 10})
+    assert total() == 20
+
+
+def test_filter():
+    values = ArraySignal(list(range(10)))
+    even = createArrayFilter(values, lambda x: x % 2 == 0)
+    assert even() == [0, 2, 4, 6, 8]
+
+    values.set(4, 40)  # stays selected: updated in place
+    version = even.version
+    assert even() == [0, 2, 40, 6, 8]
+    assert even.changes(version - 1) == {2: 4}
+
+    values.update({3: 30, 6: 7})  # 30 enters, 7 leaves the selection
+    assert even() == [0, 2, 30, 40, 8]
+    assert even.changes(even.version - 1) is None
@@ -0,0 +1,95 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+
+from fluid.signal import Signal, createEffect, createResource, fromAsyncIterator
+
+from .utils import Out
+
+
+def test_resource_loads_and_cancels_stale_fetches():
+    out = Out()
+    user_id = Signal(1)
+    started, cancelled = [], []
+
+    async def fetch_user(i):
+        started.append(i)
+        try:
+            await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            cancelled.append(i)
+            raise
+        return f"user {i}"
+
+    async def main():
+        user = createResource(user_id, fetch_user)
+        createEffect(lambda: out.write(f"{user()} loading={user.loading()}"))
+        await asyncio.sleep(0)
+        user_id.assign(2)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert started == [1, 2]
+    assert cancelled == [1]
+    out.assert_equal(["None loading=True", "user 2 loading=False"])
+
+
+def test_resource_error():
+    async def fail(i):
+        raise ValueError(i)
+
+    async def main():
+        resource = createResource(lambda: 42, fail)
+        await asyncio.sleep(0)
+        return resource
+
+    resource = asyncio.run(main())
+    assert isinstance(resource.error(), ValueError)
+    assert resource.loading() is False
+    assert resource() is None
+
+
+def test_from_async_iterator_coalesces_bursts():
+    out = Out()
+
+    async def messages():
+        for i in range(100):
+            yield i
+        await asyncio.sleep(0.01)
+        yield 100
+
+    async def main():
+        latest = fromAsyncIterator(messages(), initial_value=-1)
+        createEffect(lambda: out.write(f"latest = {latest()}"))
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    out.assert_equal(["latest = -1", "latest = 99", "latest = 100"])
+
+
+def test_from_async_iterator_cancelled_with_owner():
+    show = Signal(True)
+    values = []
+
+    async def ticks():
+        while True:
+            values.append(None)
+            yield len(values)
+            await asyncio.sleep(0.001)
+
+    async def main():
+
+        @createEffect
+        def _owner():
+            if show():
+                fromAsyncIterator(ticks())
+
+        await asyncio.sleep(0.01)
+        show.assign(False)
+        count = len(values)
+        await asyncio.sleep(0.01)
+        return count
+
+    count = asyncio.run(main())
+    assert len(values) == count
@@ -1,11 +1,20 @@
 # Copyright 2022 (c) Vincent Dutordoir
 # SPDX-License-Identifier: Apache-2.0
 
+import asyncio
 from typing import Tuple
 
 import pytest
 
-from fluid.signal import Signal, batch, createEffect, createMemo
+from fluid.signal import (
+    ManualClock,
+    Signal,
+    batch,
+    createEffect,
+    createMemo,
+    microtask,
+    setFrameScheduler,
+)
 
 from .utils import Out
 
@@ -114,3 +123,71 @@ def test_memo_and_batching(signals: Tuple[Signal, Signal], out: Out):
     out.assert_equal([
         "-3 * 5 = -15",
     ])
+
+
+def test_batch_deduplicates(signals, out: Out):
+    n1, n2 = signals
+
+    @createEffect
+    def _foo():
+        out.write(f"{n1()} + {n2()}")
+
+    out.clear()
+
+    with batch:
+        n1.assign(3)
+        n1.assign(3)
+        n2.assign(4)
+        assert batch.signals == [n1, n2]
+        assert len(batch.computations) == 1
+
+    out.assert_equal([
+        "3 + 4",
+    ])
+
+
+def test_frame_scheduler_coalesces_assignments(signals, out: Out):
+    n1, n2 = signals
+
+    @createEffect
+    def _foo():
+        out.write(f"{n1()} * {n2()} = {n1() * n2()}")
+
+    clock = ManualClock()
+    setFrameScheduler(clock)
+    try:
+        for i in range(1_000):
+            n1.assign(i)
+            n2.assign(i + 1)
+        with batch:
+            n2.assign(3)
+        # Nothing is propagated until the frame.
+        assert n1() == 1
+        assert len(clock.callbacks) == 1
+        clock.tick()
+        assert n1() == 999
+    finally:
+        setFrameScheduler(None)
+
+    out.assert_equal(["1 * 2 = 2", "999 * 3 = 2997"])
+
+    n1.assign(2)
+    assert n1() == 2
+
+
+def test_frame_scheduler_microtask(signals, out: Out):
+    n1, _ = signals
+    createEffect(lambda: out.write(f"n1 = {n1()}"))
+
+    async def burst():
+        for i in range(10, 20):
+            n1.assign(i)
+        await asyncio.sleep(0)
+
+    setFrameScheduler(microtask)
+    try:
+        asyncio.run(burst())
+    finally:
+        setFrameScheduler(None)
+
+    out.assert_equal(["n1 = 1", "n1 = 19"])
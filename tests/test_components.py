@@ -0,0 +1,446 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fluid.components import (
+    Component,
+    For,
+    HtmlComponent,
+    build_counts,
+    hydrate,
+    render_to_stream,
+    render_to_string,
+    skipped_builds,
+)
+from fluid.js import BACKEND, Element, document, queue
+from fluid.js.events import delegator
+from fluid.js.headless import HeadlessEvent
+from fluid.signal import Signal, batch, createEffect
+
+pytestmark = pytest.mark.skipif(BACKEND != "headless", reason="requires the headless DOM")
+
+
+@pytest.fixture
+def root() -> Element:
+    return Element("body")
+
+
+def test_render_static(root):
+    HtmlComponent("div", {"id": "main", "hidden": False}, "a < b", HtmlComponent("br", {})).render(root)
+    assert root.node.outerHTML == '<body><div id="main">a &lt; b<br></div></body>'
+
+
+def test_reactive_attributes_and_text(root):
+    count = Signal(0)
+    HtmlComponent(
+        "button",
+        {"class": lambda: "even" if count() % 2 == 0 else "odd", "disabled": lambda: count() > 2},
+        lambda: f"clicked {count()} times",
+    ).render(root)
+    assert root.node.outerHTML == '<body><button class="even">clicked 0 times</button></body>'
+
+    document.counts.clear()
+    count.assign(2)
+    # class and disabled didn't change: only the text is written
+    assert dict(document.counts) == {"nodeValue": 1}
+    count.assign(3)
+    assert root.node.outerHTML == \
+        '<body><button class="odd" disabled="">clicked 3 times</button></body>'
+
+
+def test_text_disposed_with_owner(root):
+    show = Signal(True)
+    text = Signal("a")
+
+    @createEffect
+    def _parent():
+        if show():
+            HtmlComponent("span", {}, text).render(root)
+
+    assert len(text.subscribed_computations) == 1
+    show.assign(False)
+    assert len(text.subscribed_computations) == 0
+
+
+def test_for_moves_minimal_nodes(root):
+    rows = Signal(list(range(10)))
+    HtmlComponent("ul", {}, For(rows, lambda i: HtmlComponent("li", {}, str(i))), "end").render(root)
+    ul = root.node.childNodes[0]
+    assert ul.textContent == "0123456789end"
+
+    document.counts.clear()
+    rows.assign([0, 1, 2, 3, 4, 5, 6, 7, 8, 42])
+    assert ul.textContent == "01234567842end"
+    assert document.counts["removeChild"] == 1
+    assert document.counts["insertBefore"] == 1
+    assert document.counts["createElement"] == 1
+
+    document.counts.clear()
+    rows.assign([42, 1, 2, 3, 4, 5, 6, 7, 8, 0])
+    assert ul.textContent == "42123456780end"
+    assert document.counts["insertBefore"] == 2
+    assert document.counts["createElement"] == 0
+
+    rows.assign([])
+    assert ul.textContent == "end"
+
+
+def test_for_renders_changed_items_again(root):
+    rows = Signal([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+    items = For(rows, lambda row: HtmlComponent("li", {}, row["name"]), key=lambda row: row["id"])
+    items.render(root)
+    assert root.node.textContent == "ab"
+
+    document.counts.clear()
+    rows.assign([{"id": 1, "name": "A"}, {"id": 2, "name": "b"}])
+    assert root.node.textContent == "Ab"
+    assert document.counts["createElement"] == 1
+    assert document.counts["removeChild"] == 1
+
+
+def test_mutations_flushed_once_per_batch(root):
+    a, b = Signal("a"), Signal("b")
+    HtmlComponent("p", {"title": lambda: a() + b()}, a, b).render(root)
+
+    with batch:
+        a.assign("x")
+        b.assign("y")
+        # effects only run at the end of the batch: nothing queued yet
+        assert len(queue) == 0
+
+    assert queue.last_flush_crossings == 3
+    assert root.node.outerHTML == '<body><p title="xy">xy</p></body>'
+
+
+def _counter(count, rows):
+    return HtmlComponent(
+        "div",
+        {"class": lambda: "even" if count() % 2 == 0 else "odd", "hidden": False},
+        "<static>",
+        lambda: f"count {count()}",
+        HtmlComponent("ul", {}, For(rows, lambda i: HtmlComponent("li", {}, str(i)))),
+        HtmlComponent("br", {}),
+    )
+
+
+class Counter(Component):
+
+    def __init__(self, count, rows):
+        self.count = count
+        self.rows = rows
+
+    def build(self):
+        return _counter(self.count, self.rows)
+
+
+def test_mutations_flushed_in_worker_thread():
+
+    def render():
+        body = Element("body")
+        text = Signal("a")
+        with batch:
+            HtmlComponent("div", {"title": text}, text).render(body)
+        text.assign("b")
+        return body.node.outerHTML, len(queue)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        html, queued = executor.submit(render).result()
+    assert html == '<body><div title="b">b</div></body>'
+    assert queued == 0
+
+
+def test_render_to_string():
+    count, rows = Signal(1), Signal([1, 2])
+    document.counts.clear()
+    chunks = list(render_to_stream(_counter(count, rows)))
+    assert len(chunks) > 1
+    assert "".join(chunks) == (
+        '<div class="odd">&lt;static&gt;<!--t-->count 1<!--/t-->'
+        '<ul><!--for--><li>1</li><li>2</li><!--/for--></ul><br></div>'
+    )
+    # No nodes are created and nothing subscribes to the signals.
+    assert sum(document.counts.values()) == 0
+    assert not count.subscribed_computations and not rows.subscribed_computations
+
+
+def test_hydrate_reuses_server_nodes(root):
+    count, rows = Signal(1), Signal([1, 2])
+    root.node.innerHTML = render_to_string(Counter(count, rows))
+    server_html = root.node.outerHTML
+    div = root.node.childNodes[0]
+
+    document.counts.clear()
+    build_counts.clear()
+    hydrate(Counter(count, rows), root)
+    assert sum(document.counts.values()) == 0
+    assert root.node.outerHTML == server_html
+
+    count.assign(2)
+    rows.assign([2, 1, 3])
+    assert root.node.childNodes[0] is div
+    assert document.counts["createElement"] == 1
+    assert root.node.outerHTML == (
+        '<body><div class="even">&lt;static&gt;<!--t-->count 2<!--/t-->'
+        '<ul><!--for--><li>2</li><li>1</li><li>3</li><!--/for--></ul><br></div></body>'
+    )
+    # The effects are attached to the hydrated nodes, the component isn't built again.
+    assert dict(build_counts) == {"Counter": 1}
+
+
+def test_hydrate_empty_text(root):
+    text = Signal("")
+    root.node.innerHTML = render_to_string(HtmlComponent("p", {}, text))
+    hydrate(HtmlComponent("p", {}, text), root)
+    text.assign("a")
+    assert root.node.outerHTML == "<body><p><!--t-->a<!--/t--></p></body>"
+
+
+def test_hydrated_component_rebuilds(root):
+    text = Signal("a")
+    build_counts.clear()
+    root.node.innerHTML = render_to_string(Card(text, Signal("x")))
+    div = root.node.childNodes[0]
+
+    document.counts.clear()
+    hydrate(Card(text, Signal("x")), root)
+    assert root.node.childNodes[0] is div
+    assert sum(document.counts.values()) == 0
+    # Only the build effect of the card subscribes to the title.
+    assert len(text.subscribed_computations) == 1
+
+    text.assign("b")
+    assert root.node.outerHTML == '<body><div>b<span>x</span><span>static</span></div></body>'
+    assert dict(build_counts) == {"Card": 2, "Label": 2}
+
+
+class Label(Component):
+
+    def __init__(self, text):
+        self.text = text
+
+    def build(self):
+        return HtmlComponent("span", {}, self.text)
+
+
+class Card(Component):
+
+    def __init__(self, title, label):
+        self.title = title
+        self.label = label
+
+    def build(self):
+        return HtmlComponent("div", {}, self.title(), Label(self.label()), Label("static"))
+
+
+def test_component_skips_build_with_equal_props(root):
+    title, label = Signal("a"), Signal("x")
+    build_counts.clear()
+    skipped_builds.clear()
+    Card(title, label).render(root)
+    assert dict(build_counts) == {"Card": 1, "Label": 2}
+    span = root.node.childNodes[0].childNodes[1]
+
+    title.assign("b")
+    assert root.node.outerHTML == '<body><div>b<span>x</span><span>static</span></div></body>'
+    assert dict(build_counts) == {"Card": 2, "Label": 2}
+    assert dict(skipped_builds) == {"Label": 2}
+    assert root.node.childNodes[0].childNodes[1] is span
+
+    label.assign("y")
+    assert root.node.outerHTML == '<body><div>b<span>y</span><span>static</span></div></body>'
+    assert dict(build_counts) == {"Card": 3, "Label": 3}
+
+
+def test_reused_component_rebuilds_in_new_parent(root):
+    outer, inner = Signal(0), Signal(0)
+
+    class Child(Component):
+
+        def __init__(self, text):
+            self.text = text
+
+        def build(self):
+            return HtmlComponent("span", {}, f"{self.text}{inner()}")
+
+    class Parent(Component):
+
+        def build(self):
+            return HtmlComponent("div", {"data-o": str(outer())}, Child("x"))
+
+    Parent().render(root)
+    outer.assign(1)
+    inner.assign(1)
+    assert root.node.outerHTML == '<body><div data-o="1"><span>x1</span></div></body>'
+
+
+def test_component_rebuilt_in_rendering_batch(root):
+    text = Signal("a")
+
+    class Paragraph(Component):
+
+        def build(self):
+            return HtmlComponent("p", {}, text())
+
+    with batch:
+        Paragraph().render(root)
+        text.assign("b")
+    assert root.node.outerHTML == "<body><p>b</p></body>"
+    text.assign("c")
+    assert root.node.outerHTML == "<body><p>c</p></body>"
+
+
+class Inner(Component):
+
+    def __init__(self, text, suffix):
+        self.text = text
+        self.suffix = suffix
+
+    def build(self):
+        return HtmlComponent("p", {}, f"{self.text}{self.suffix()}")
+
+
+class Outer(Component):
+
+    def __init__(self, text, suffix, other):
+        self.text = text
+        self.suffix = suffix
+        self.other = other
+
+    def build(self):
+        self.other()
+        return Inner(self.text(), self.suffix)
+
+
+def test_component_built_as_reused_component(root):
+    text, suffix, other = Signal("a"), Signal(0), Signal(0)
+    Outer(text, suffix, other).render(root)
+    other.assign(1)
+    assert root.node.outerHTML == "<body><p>a0</p></body>"
+    suffix.assign(1)
+    assert root.node.outerHTML == "<body><p>a1</p></body>"
+
+
+def test_component_built_as_rebuilt_component(root):
+    text, suffix, other = Signal("a"), Signal(0), Signal(0)
+    Outer(text, suffix, other).render(root)
+    suffix.assign(1)
+    text.assign("b")
+    assert root.node.outerHTML == "<body><p>b1</p></body>"
+    suffix.assign(2)
+    text.assign("c")
+    assert root.node.outerHTML == "<body><p>c2</p></body>"
+
+
+def test_components_built_in_threads():
+
+    class Slow(Component):
+
+        def __init__(self, title):
+            self.title = title
+
+        def build(self):
+            time.sleep(0.001)  # lets the other threads build meanwhile
+            return HtmlComponent("div", {}, self.title(), Label("x"))
+
+    def render(_):
+        body = Element("body")
+        title = Signal("0")
+        Slow(title).render(body)
+        for i in range(1, 10):
+            title.assign(str(i))
+        return body.node.outerHTML
+
+    build_counts.clear()
+    skipped_builds.clear()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        pages = list(executor.map(render, range(16)))
+    assert set(pages) == {"<body><div>9<span>x</span></div></body>"}
+    # Every thread memoizes the children of its own components.
+    assert dict(build_counts) == {"Slow": 16 * 10, "Label": 16}
+    assert dict(skipped_builds) == {"Label": 16 * 9}
+
+
+def test_component_disposed_with_owner(root):
+    show, text = Signal(True), Signal("a")
+
+    class Text(Component):
+
+        def build(self):
+            return HtmlComponent("p", {}, text)
+
+    class Page(Component):
+
+        def build(self):
+            return HtmlComponent("div", {}, Text())
+
+    @createEffect
+    def _parent():
+        if show():
+            Page().render(root)
+
+    assert len(text.subscribed_computations) == 1
+    show.assign(False)
+    assert len(text.subscribed_computations) == 0
+
+
+def test_delegated_events(root):
+    count = Signal(0)
+    clicks = []
+
+    def increment(event):
+        count.assign(count() + 1)
+        clicks.append("button")
+
+    HtmlComponent(
+        "div",
+        {"pys-onClick": lambda event: clicks.append("div")},
+        HtmlComponent("button", {"pys-onClick": increment}, HtmlComponent("b", {}, count)),
+        HtmlComponent("span", {"title": count}, count),
+    ).render(root)
+    button = root.node.childNodes[0].childNodes[0]
+
+    flushes = queue.flushes
+    button.childNodes[0].dispatchEvent(HeadlessEvent("click"))
+    assert clicks == ["button", "div"]
+    # A single flush applies the text and attribute updates made by the handler.
+    assert queue.flushes == flushes + 1
+    assert root.node.childNodes[0].childNodes[1].outerHTML == '<span title="1">1</span>'
+    assert button.textContent == "1"
+    assert len(document.listeners["click"]) == 1
+
+
+def test_delegated_non_bubbling_events(root):
+    focused = []
+    HtmlComponent(
+        "form",
+        {"pys-onFocus": lambda event: focused.append("form")},
+        HtmlComponent("input", {"pys-onFocus": lambda event: focused.append("input")}),
+    ).render(root)
+    form = root.node.childNodes[0]
+
+    form.childNodes[0].dispatchEvent(HeadlessEvent("focus"))
+    assert focused == ["input"]
+    form.dispatchEvent(HeadlessEvent("focus"))
+    assert focused == ["input", "form"]
+
+
+def test_delegated_handler_must_be_callable(root):
+    with pytest.raises(TypeError, match="'click' events must be a callable"):
+        HtmlComponent("button", {"pys-onClick": "increment()"}).render(root)
+
+
+def test_delegated_handler_disposed_with_owner(root):
+    show = Signal(True)
+
+    @createEffect
+    def _parent():
+        if show():
+            HtmlComponent("button", {"pys-onClick": lambda event: None}).render(root)
+
+    handlers = len(delegator.handlers["click"])
+    show.assign(False)
+    assert len(delegator.handlers["click"]) == handlers - 1
@@ -0,0 +1,53 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+
+from fluid.logging import disable_tracing, enable_tracing, get_tracer
+from fluid.signal import Signal, createEffect
+
+
+def test_tracing_disabled_by_default(capsys):
+    assert not get_tracer("batch").enabled
+
+    n = Signal(1)
+    createEffect(lambda: n())
+    n.assign(2)
+
+    captured = capsys.readouterr()
+    assert captured.out == "" and captured.err == ""
+
+
+def test_tracing_per_subsystem():
+    events = []
+
+    def _sink(subsystem, level, event, fields):
+        events.append((subsystem, event))
+
+    n = Signal(1)
+    createEffect(lambda: n(), name="effect")
+
+    enable_tracing("batch", sink=_sink)
+    try:
+        n.assign(2)
+    finally:
+        disable_tracing("batch")
+
+    assert events == [("batch", "commit"), ("batch", "execute")]
+
+    events.clear()
+    n.assign(3)
+    assert events == []
+
+
+def test_tracing_level():
+    events = []
+    tracer = get_tracer("test")
+    enable_tracing("test", level=logging.INFO, sink=lambda *args: events.append(args[2]))
+    try:
+        tracer.debug("hidden")
+        tracer.info("shown", key=1)
+    finally:
+        disable_tracing("test")
+
+    assert events == ["shown"]
@@ -0,0 +1,88 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from fluid.offload import SHARED_MEMORY_THRESHOLD, createOffloadedMemo
+from fluid.signal import Signal, createEffect, getRuntime
+
+from .utils import Out
+
+
+def total(values, scale):
+    assert isinstance(values, memoryview), "large buffers are shared, not pickled"
+    return sum(values) * scale
+
+
+def _wait_for(predicate, timeout=10.0):
+    # Results are posted to the runtime, which assigns them when drained.
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+        getRuntime().drain()
+
+
+class Elementwise:
+    """Compared elementwise, like NumPy arrays: comparisons have no truth value."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self
+
+    def __bool__(self):
+        raise ValueError("The truth value is ambiguous")
+
+
+def elementwise(value):
+    return Elementwise(value)
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        yield executor
+
+
+def test_offloaded_memo(executor):
+    out = Out()
+    n = SHARED_MEMORY_THRESHOLD // 8
+    values = Signal(array("d", [1.0] * n))
+    scale = Signal(1)
+
+    result = createOffloadedMemo(lambda: (values(), scale()), total, executor, initial_value=0.0)
+    createEffect(lambda: out.write(f"total = {result()}"))
+    _wait_for(lambda: result() == n)
+
+    scale.assign(2)
+    assert result() == n
+    _wait_for(lambda: result() == 2 * n)
+    out.assert_equal(["total = 0.0", f"total = {float(n)}", f"total = {2.0 * n}"])
+
+    with pytest.raises(Exception):
+        result.assign(0.0)
+
+
+def test_offloaded_memo_delivered_by_event_loop(executor):
+    out = Out()
+    scale = Signal(1)
+
+    async def main():
+        result = createOffloadedMemo(lambda: (scale(), ), elementwise, executor)
+        createEffect(lambda: out.write(f"value = {getattr(result(), 'value', None)}"))
+        for expected in (1, 2):
+            scale.assign(expected)
+            deadline = time.monotonic() + 10.0
+            while getattr(result(), "value", None) != expected:
+                assert time.monotonic() < deadline, "timed out"
+                await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    out.assert_equal(["value = None", "value = 1", "value = 2"])
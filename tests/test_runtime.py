@@ -0,0 +1,91 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fluid.signal import Runtime, Signal, batch, createEffect, createMemo, getRuntime
+
+from .utils import Out
+
+
+def test_threads_run_independent_graphs():
+
+    def pipeline(seed):
+        head = Signal(seed)
+        tail = head
+        for _ in range(50):
+            tail = createMemo(lambda prev=tail: prev() + 1)
+        seen = []
+        createEffect(lambda: seen.append(tail()))
+        for i in range(1, 200):
+            with batch:
+                head.assign(seed + i)
+        return seen, getRuntime()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(pipeline, [1_000 * t for t in range(8)]))
+
+    for t, (seen, _) in enumerate(results):
+        assert seen == [1_000 * t + i + 50 for i in range(200)]
+    assert getRuntime() not in {runtime for _, runtime in results}
+
+
+def test_assign_from_other_thread_is_posted():
+    out = Out()
+    count = Signal(0)
+    createEffect(lambda: out.write(f"{count()} on {threading.current_thread().name}"))
+
+    def work():
+        for i in range(1, 6):
+            count.assign(i)
+
+    thread = threading.Thread(target=work, name="worker")
+    thread.start()
+    thread.join()
+    # Nothing is assigned until the runtime of the signal drains its inbox.
+    assert count() == 0
+    getRuntime().drain()
+    assert count() == 5
+
+    main = threading.current_thread().name
+    out.assert_equal([f"0 on {main}", f"5 on {main}"])
+
+
+def test_wakeup_drains_in_the_runtime():
+    runtime = getRuntime()
+    count = Signal(0)
+    doubled = createMemo(lambda: count() * 2)
+    seen = []
+    createEffect(lambda: seen.append((count(), doubled(), getRuntime() is runtime)))
+
+    async def main():
+        runtime.wakeup = asyncio.get_running_loop().call_soon_threadsafe
+        thread = threading.Thread(target=lambda: count.assign(5))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0)
+
+    try:
+        asyncio.run(main())
+    finally:
+        runtime.wakeup = None
+    assert seen == [(0, 0, True), (5, 10, True)]
+
+
+def test_runtime_run_isolates_batches():
+    runtime = Runtime()
+    a = Signal(1)
+
+    def pipeline():
+        b = Signal(2)
+        with batch:
+            b.assign(3)
+            # The batch of the caller's runtime isn't affected.
+            a.assign(4)
+        return b()
+
+    with batch:
+        assert runtime.run(pipeline) == 3
+    assert a() == 4
@@ -3,11 +3,22 @@
 
 from __future__ import annotations
 
+import sys
 from typing import Tuple
 
 import pytest
 
-from fluid.signal import Signal, createEffect
+from fluid.signal import (
+    Computation,
+    Signal,
+    batch,
+    createEffect,
+    createMemo,
+    createRoot,
+    getRootStats,
+    mapArray,
+    trackRoots,
+)
 
 from .utils import Out
 
@@ -101,3 +112,314 @@ def test_signal_composition(signals, out):
     # should have been disposed - we expect no output.
     sirname.assign("Kavaliski")
     out.assert_equal([])
+
+
+def test_diamond_runs_effect_once(out):
+    n = Signal(1)
+    double = createMemo(lambda: n() * 2)
+    square = createMemo(lambda: n()**2)
+    total = createMemo(lambda: double() + square())
+
+    @createEffect
+    def _effect():
+        out.write(f"{n()} {total()}")
+
+    assert total.height > double.height > n.height
+
+    out.assert_equal(["1 3"])
+    n.assign(3)
+    out.assert_equal(["3 15"])
+
+
+def test_height_raised_by_dynamic_dependency(out):
+    use_memo = Signal(False)
+    n = Signal(1)
+    plus_one = createMemo(lambda: n() + 1)
+    plus_two = createMemo(lambda: plus_one() + 1)
+
+    @createEffect
+    def _effect():
+        if use_memo():
+            out.write(f"{n()} {plus_two()}")
+        else:
+            out.write(f"{n()}")
+
+    out.assert_equal(["1"])
+    use_memo.assign(True)
+    out.assert_equal(["1 3"])
+    n.assign(5)
+    # the effect now depends on the memo chain and must only run after it
+    out.assert_equal(["5 7"])
+
+
+def test_deep_memo_chain(out):
+    # deeper than the default recursion limit of Python
+    depth = 5 * sys.getrecursionlimit()
+    head = Signal(0)
+    tail = head
+    for _ in range(depth):
+        tail = createMemo(lambda prev=tail: prev() + 1)
+
+    @createEffect
+    def _effect():
+        out.write(str(tail()))
+
+    out.assert_equal([str(depth)])
+    head.assign(1)
+    out.assert_equal([str(depth + 1)])
+
+    # head, `depth` memo computations and signals, and the effect
+    topo = head.get_topo()
+    assert len(topo) == 2 * depth + 2
+    assert topo[0] is head and topo[-2] is tail
+
+
+def test_equal_assignment_does_not_notify(out):
+    n = Signal(1)
+    always = Signal(1, equals=False)
+    parity = Signal(1, equals=lambda old, new: old % 2 == new % 2)
+
+    @createEffect
+    def _effect():
+        out.write(f"{n()} {always()} {parity()}")
+
+    out.assert_equal(["1 1 1"])
+    n.assign(1)
+    out.assert_equal([])
+    always.assign(1)
+    out.assert_equal(["1 1 1"])
+    parity.assign(3)
+    out.assert_equal([])
+    parity.assign(4)
+    out.assert_equal(["1 1 4"])
+
+
+class Elementwise:
+    """Compared elementwise, like NumPy arrays: comparisons have no truth value."""
+
+    def __eq__(self, other):
+        return self
+
+    __ne__ = __eq__
+
+    def __bool__(self):
+        raise ValueError("The truth value is ambiguous")
+
+
+def test_values_without_truthy_comparison(out):
+    array = Elementwise()
+    values = Signal(array)
+
+    @createEffect
+    def _effect():
+        out.write(str(values() is array))
+
+    values.assign(array)
+    out.assert_equal(["True"])
+    values.assign(Elementwise())
+    out.assert_equal(["False"])
+
+
+def test_unchanged_memo_stops_propagation():
+    n = Signal(2)
+    is_even = createMemo(lambda: n() % 2 == 0)
+    runs = []
+
+    @createEffect
+    def _effect():
+        runs.append(is_even())
+
+    n.assign(4)
+    n.assign(6)
+    assert runs == [True]
+    n.assign(7)
+    assert runs == [True, False]
+
+
+def test_lazy_memo_only_computes_when_read(out):
+    n = Signal(1)
+
+    def _square():
+        out.write("compute")
+        return n()**2
+
+    square = createMemo(_square, lazy=True)
+    out.assert_equal([])
+
+    n.assign(2)
+    n.assign(3)
+    out.assert_equal([])
+    assert square() == 9
+    assert square() == 9
+    out.assert_equal(["compute"])
+
+    n.assign(4)
+    out.assert_equal([])
+    assert square() == 16
+    out.assert_equal(["compute"])
+
+
+def test_deep_lazy_memo_chain():
+    depth = 5 * sys.getrecursionlimit()
+    head = Signal(0)
+    tail = head
+    for _ in range(depth):
+        tail = createMemo(lambda prev=tail: prev() + 1, lazy=True)
+
+    assert tail() == depth
+    head.assign(1)
+    assert tail() == depth + 1
+
+
+def test_lazy_pull_through_eager_memo():
+    base, trig, flag = Signal(10), Signal(0), Signal(False)
+    c = createMemo(lambda: base(), lazy=True)
+    m = createMemo(lambda: c() + 1 if trig() else -1)
+    a = createMemo(lambda: m() + 1000, lazy=True)
+    seen = []
+    createEffect(lambda: seen.append(a() if flag() else None))
+
+    with batch:
+        flag.assign(True)
+        trig.assign(1)
+    assert m() == 11
+    assert seen == [None, 1011]
+
+    base.assign(20)
+    assert m() == 21
+    assert seen == [None, 1011, 1021]
+
+
+def test_observed_lazy_memo_is_eager(out):
+    n = Signal(1)
+    square = createMemo(lambda: n()**2, lazy=True)
+
+    @createEffect
+    def _effect():
+        out.write(f"{n()} {square()}")
+
+    out.assert_equal(["1 1"])
+    n.assign(-1)
+    # memo didn't change, but the effect also reads `n`
+    out.assert_equal(["-1 1"])
+    n.assign(2)
+    out.assert_equal(["2 4"])
+
+
+def test_stable_sources_stay_subscribed(signals, out):
+    name, sirname, fullname = signals
+
+    @createEffect
+    def _effect():
+        if fullname():
+            out.write(f"{name()} {sirname()}")
+        else:
+            out.write(f"{name()}")
+
+    (computation, ) = name.subscribed_computations
+    assert set(computation.sources) == {name, sirname, fullname}
+
+    name.assign("Tom")
+    assert set(computation.sources) == {name, sirname, fullname}
+
+    fullname.assign(False)
+    assert set(computation.sources) == {name, fullname}
+    assert len(sirname.subscribed_computations) == 0
+
+    fullname.assign(True)
+    assert set(computation.sources) == {name, sirname, fullname}
+    assert sirname.subscribed_computations == {computation}
+    out.assert_equal(["Joe Doe", "Tom Doe", "Tom", "Tom Doe"])
+
+
+def test_disposed_computation_is_not_executed(out):
+    flag = Signal(True)
+    negated = createMemo(lambda: not flag())
+
+    @createEffect
+    def _parent():
+        value = flag()
+        out.write(f"parent {value}")
+
+        @createEffect
+        def _child():
+            # reads the memo so that the child ranks higher than the parent
+            out.write(f"child {value} {flag()} {negated()}")
+
+    out.assert_equal(["parent True", "child True True False"])
+    flag.assign(False)
+    # The first child is scheduled by `flag` too, but disposed by the parent before
+    # its turn: only the newly created child executes.
+    out.assert_equal(["parent False", "child False False True"])
+
+
+def test_map_array_reuses_items_by_key(out):
+    rows = Signal([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+    labels = {1: Signal("one"), 2: Signal("two"), 3: Signal("three")}
+
+    def _map(row):
+        out.write(f"map {row['id']}")
+
+        @createEffect
+        def _label():
+            out.write(f"label {labels[row['id']]()}")
+
+        return row["id"]
+
+    ids = mapArray(rows, _map, key=lambda row: row["id"])
+    assert ids() == [1, 2]
+    out.assert_equal(["map 1", "label one", "map 2", "label two"])
+
+    rows.assign([{"id": 2, "name": "b"}, {"id": 3, "name": "c"}, {"id": 1, "name": "a"}])
+    assert ids() == [2, 3, 1]
+    out.assert_equal(["map 3", "label three"])
+
+    # a changed item is mapped again, the effects of its previous mapping are disposed
+    rows.assign([{"id": 2, "name": "b"}, {"id": 3, "name": "c"}, {"id": 1, "name": "A"}])
+    out.assert_equal(["map 1", "label one"])
+
+    # effects of an item are owned by the item, not by the list
+    labels[1].assign("uno")
+    out.assert_equal(["label uno"])
+
+    rows.assign([{"id": 3, "name": "c"}])
+    assert ids() == [3]
+    labels[1].assign("eins")
+    labels[2].assign("zwei")
+    out.assert_equal([])
+
+
+def test_create_root_dispose(out):
+    count = Signal(0)
+    trackRoots()
+    try:
+
+        def app(dispose):
+            doubled = createMemo(lambda: count() * 2)
+            createEffect(lambda: out.write(f"doubled = {doubled()}"))
+            return dispose
+
+        dispose = createRoot(app, name="app")
+        assert [tuple(stats) for stats in getRootStats()] == [("app", 2, 2)]
+
+        count.assign(1)
+        dispose()
+        count.assign(2)
+        assert getRootStats() == []
+    finally:
+        trackRoots(False)
+
+    out.assert_equal(["doubled = 0", "doubled = 2"])
+    assert len(count.subscribed_computations) == 0
+
+
+def test_disposed_child_unlinked_from_owner():
+    a = Signal(0)
+    owner = Computation(None)
+    for _ in range(100):
+        child = Computation(lambda: a(), owner=owner)
+        child.execute()
+        child.cleanup()
+
+    assert not owner.children
+    assert not a.subscribed_computations
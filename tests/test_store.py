@@ -0,0 +1,72 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+from fluid.signal import createEffect
+from fluid.store import createStore, reconcile
+
+from .utils import Out
+
+
+def _state():
+    return {
+        "user": {"name": "Joe", "age": 40},
+        "todos": [{"title": "a", "done": False}, {"title": "b", "done": False}],
+    }
+
+
+def test_leaf_update_notifies_leaf_readers_only():
+    out = Out()
+    state, setState = createStore(_state())
+    createEffect(lambda: out.write(f"name = {state['user']['name']}"))
+    createEffect(lambda: out.write(f"age = {state['user']['age']}"))
+    createEffect(lambda: out.write(f"done = {[todo['done'] for todo in state['todos']]}"))
+    out.assert_equal(["name = Joe", "age = 40", "done = [False, False]"])
+
+    setState("user", "age", lambda age: age + 1)
+    out.assert_equal(["age = 41"])
+
+    setState("user", "name", "Joe")  # unchanged
+    setState("todos", 1, "done", True)
+    out.assert_equal(["done = [False, True]"])
+
+    setState("todos", 2, {"title": "c", "done": True})  # appended
+    out.assert_equal(["done = [False, True, True]"])
+
+
+def test_reconcile_only_notifies_changed_leaves():
+    out = Out()
+    state, setState = createStore(_state())
+    createEffect(lambda: out.write(f"name = {state['user']['name']}"))
+    createEffect(lambda: out.write(f"titles = {[todo['title'] for todo in state['todos']]}"))
+    createEffect(lambda: out.write(f"keys = {sorted(state['user'])}"))
+    out.clear()
+
+    new = _state()
+    new["user"]["name"] = "Jane"
+    new["todos"].pop()
+    setState(reconcile(new))
+    out.assert_equal(["name = Jane", "titles = ['a']"])
+
+    setState("user", reconcile({"name": "Jane", "email": "jane@doe"}))
+    out.assert_equal(["keys = ['email', 'name']"])
+    assert state.unwrap() == {
+        "user": {"name": "Jane", "email": "jane@doe"},
+        "todos": [{"title": "a", "done": False}],
+    }
+
+
+def test_root_merge_and_get():
+    state, setState = createStore({"a": 1})
+    seen = []
+    createEffect(lambda: seen.append(state.get("b", "missing")))
+    setState({"b": 2})
+    assert seen == ["missing", 2]
+    assert dict(state.items()) == {"a": 1, "b": 2}
+
+
+def test_negative_index_tracks_length():
+    seen = []
+    state, setState = createStore({"items": [1, 2, 3]})
+    createEffect(lambda: seen.append(state["items"][-1]))
+    setState("items", 3, 4)
+    assert seen == [3, 4]
@@ -0,0 +1,26 @@
+# Copyright 2022 (c) Vincent Dutordoir
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from fluid.utils import longest_increasing_subsequence
+
+
+@pytest.mark.parametrize(
+    "values, expected_length",
+    [
+        ([], 0),
+        ([-1, -1], 0),
+        ([0, 1, 2, 3], 4),
+        ([3, 2, 1, 0], 1),
+        ([0, 8, 4, 12, 2, 10, 6, 14, 1, 9], 4),
+        ([9, 1, 2, -1, 3, 4, 0], 4),
+    ],
+)
+def test_longest_increasing_subsequence(values, expected_length):
+    positions = longest_increasing_subsequence(values)
+    assert len(positions) == expected_length
+    assert positions == sorted(positions)
+    subsequence = [values[i] for i in positions]
+    assert all(v >= 0 for v in subsequence)
+    assert all(a < b for a, b in zip(subsequence, subsequence[1:]))